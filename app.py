@@ -1,9 +1,10 @@
+import time
+_script_start = time.perf_counter()   # startup timeline origin, before any heavy import
+
 import streamlit as st
 import re
-import csv
-import ast
-import datetime
-from io import BytesIO
+import os
+import uuid
 
 # ── Page config (must be first) ──────────────────────────────────────────────
 st.set_page_config(
@@ -14,97 +15,115 @@ st.set_page_config(
 )
 
 # ── Load UI styles ────────────────────────────────────────────────────────────
-from ui import inject_css, render_sidebar, render_topbar, render_welcome, render_messages, render_input_panel
+from ui import (inject_css, render_sidebar, render_topbar, render_welcome, render_messages,
+                render_filtered_papers, render_input_panel, MESSAGE_WINDOW, SUGGESTIONS)
+from session_store import SessionStore, session_title
+from dataset import DATASET_PATH, parse_terms
+from digests import DigestStore, digest_path
+from search_index import PositionalIndex
+from startup import Warmup
+from report import generate_pdf
+from prompting import build_chat_messages, invoke_with_stats, llm_options
+from prefetch import Prefetcher
+from related import related_path, load_graph, expand_with_neighbours
+from clusters import CLUSTER_PROBE
 
 inject_css()
 
-# ── Imports ───────────────────────────────────────────────────────────────────
-from langchain_ollama import ChatOllama
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+# LangChain/Ollama and ReportLab are imported on first use, not here: the UI shell
+# renders first while the index and model warm up in the background (see startup.py).
+
+LLM_MODEL = "llama3.2"
+
+# Speculative "summarise these" drafts replace Ollama's cached prompt prefix and can
+# hold the model when the user's next question arrives. Only enable them when Ollama
+# has spare parallel slots (OLLAMA_NUM_PARALLEL > 1).
+PREFETCH_LLM_DRAFTS = False
 
 # ═════════════════════════════════════════════════════════════════════════════
-# DATASET
+# DATASET & WARM-UP
 # ═════════════════════════════════════════════════════════════════════════════
-DATASET_PATH = "arxiv_data.csv"
+def warm_llm():
+    """Have Ollama load the model into memory before the first question arrives."""
+    from langchain_ollama import ChatOllama
+    ChatOllama(model=LLM_MODEL, num_predict=1, **llm_options()).invoke("ping")
 
-@st.cache_data(show_spinner=False)
-def load_dataset(path: str):
-    papers = []
-    try:
-        with open(path, newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                papers.append({
-                    "title":   row.get("titles",    "").strip(),
-                    "summary": row.get("summaries", "").strip(),
-                    "terms":   row.get("terms",     "[]").strip(),
-                })
-    except FileNotFoundError:
-        pass
-    return papers
-
-def parse_terms(terms_str: str):
-    try:
-        return ast.literal_eval(terms_str)
-    except:
-        return []
-
-def search_papers(query: str, papers: list, top_k: int = 5, category_filter: str = None):
-    if not papers or not query.strip():
-        return []
-    query_words = set(re.findall(r'\b\w{3,}\b', query.lower()))
-    stop_words  = {'the','and','for','that','this','with','are','from','have',
-                   'what','how','does','explain','tell','me','about','please'}
-    query_words -= stop_words
-
-    scored = []
-    for paper in papers:
-        text  = (paper["title"] + " " + paper["summary"]).lower()
-        terms = parse_terms(paper["terms"])
-
-        if category_filter and category_filter != "All":
-            cat_map = {
-                "Machine Learning": ["cs.LG", "stat.ML"],
-                "Computer Vision":  ["cs.CV"],
-                "NLP":              ["cs.CL", "cs.IR"],
-                "Robotics":         ["cs.RO"],
-                "AI":               ["cs.AI"],
-                "Systems":          ["cs.DC", "cs.OS", "cs.NI"],
-            }
-            allowed = cat_map.get(category_filter, [])
-            if not any(t in terms for t in allowed):
-                continue
-
-        score = 0
-        for word in query_words:
-            count = text.count(word)
-            if count:
-                score += count
-                if word in paper["title"].lower():
-                    score += 5
-        if score > 0:
-            scored.append((score, paper))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [p for _, p in scored[:top_k]]
-
-def build_context_from_papers(papers: list) -> str:
+@st.cache_resource(show_spinner=False)
+def get_warmup(path: str):
+    # The timeline starts at the first script run, so import time is included
+    return Warmup(path, warm_model=warm_llm, started=_script_start)
+
+@st.cache_resource
+def get_digest_store(path: str, n_papers: int, _papers):
+    """Precomputed paper digests (see digests.py), or None if missing or built for another snapshot."""
+    if not os.path.exists(path):
+        return None
+    store = DigestStore(path)
+    return store if store.matches(_papers) else None
+
+@st.cache_resource
+def get_related_graph(path: str, n_papers: int):
+    """Precomputed kNN graph (see related.py), or None if missing or built for another snapshot."""
+    return load_graph(path, n_papers)
+
+def search_papers(query: str, index: PositionalIndex, top_k: int = 5, category_filter: str = None,
+                  n_probe: int = None):
+    """
+    Rank papers with the positional index: term counts, title hits, phrases and proximity.
+    With `n_probe`, only the n_probe topic clusters closest to the query are scored.
+    Returns (top_k papers, per-category hit counts for the unfiltered query).
+    """
+    if not len(index) or not query.strip():
+        return [], {}
+    return index.search_faceted(query, top_k=top_k, category_filter=category_filter, n_probe=n_probe)
+
+def retrieve(query: str, index: PositionalIndex, category_filter: str = None,
+             digests_from=None, graph=None, n_probe: int = None) -> dict:
+    """
+    Spell-correct the query, rank papers for it, add their nearest neighbours from the
+    related-papers graph and fetch digests for all of them.
+    """
+    # Misspelled words with no postings are swapped for their closest vocabulary term
+    search_query, corrections = index.correct_query(query)
+    found, facets = search_papers(search_query, index, top_k=5, category_filter=category_filter,
+                                  n_probe=n_probe)
+    related = expand_with_neighbours(found, graph, index.papers)
+    ids     = [p["id"] for p in found + related]
+    return {
+        "search_query": search_query,
+        "corrections":  corrections,
+        "papers":       found,
+        "related":      related,
+        "facets":       facets,
+        "digests":      digests_from.get_many(ids) if digests_from and ids else {},
+    }
+
+def build_context_from_papers(papers: list, digests: dict = None, related: list = None) -> str:
     if not papers:
         return ""
+    digests = digests or {}
     ctx = "RELEVANT PAPERS FROM ARXIV DATASET:\n\n"
     for i, p in enumerate(papers, 1):
         terms = parse_terms(p["terms"])
         ctx += f"[Paper {i}] {p['title']}\n"
         ctx += f"Categories: {', '.join(terms)}\n"
-        ctx += f"Abstract: {p['summary'][:600]}...\n\n"
+        if p["id"] in digests:
+            ctx += f"Digest: {digests[p['id']]}\n\n"
+        else:
+            ctx += f"Abstract: {p['summary'][:600]}...\n\n"
+    if related:
+        ctx += "CLOSELY RELATED PAPERS (nearest neighbours of the above):\n\n"
+        for p in related:
+            ctx += f"[Related] {p['title']}\n"
+            ctx += f"{digests.get(p['id']) or p['summary'][:300] + '...'}\n\n"
     return ctx
 
 # ═════════════════════════════════════════════════════════════════════════════
 # SUMMARISATION
 # ═════════════════════════════════════════════════════════════════════════════
-SUMMARISE_SYSTEM = """You are ResearchMind AI — an expert academic summariser.
-
-Given one or more ArXiv paper abstracts, produce a clean structured summary in this format:
+# Per-turn answer instructions ride on the user's message, after the fixed system
+# prompt and the replayed history (see prompting.build_chat_messages).
+SUMMARY_FORMAT = """Summarise the ArXiv papers attached below in this structure:
 
 ## Executive Summary
 [3-4 sentence high-level summary of all retrieved papers combined]
@@ -126,167 +145,27 @@ Given one or more ArXiv paper abstracts, produce a clean structured summary in t
 
 Be concise, accurate, and academic. Only use what is in the provided abstracts — do not hallucinate."""
 
-def summarise_papers(papers: list, llm) -> str:
-    """Ask the LLM to summarise the retrieved papers."""
+def summarise_papers(papers: list, llm, digests: dict = None, history: list = (),
+                     query: str = "Summarise these papers."):
+    """
+    Ask the LLM to summarise the retrieved papers, using precomputed digests where available.
+    The conversation so far is replayed ahead of the request, as on every other turn.
+    Returns (summary, turn stats).
+    """
     if not papers:
-        return "No papers found to summarise."
+        return "No papers found to summarise.", {}
 
+    digests = digests or {}
     paper_block = ""
     for i, p in enumerate(papers, 1):
         terms = parse_terms(p["terms"])
         paper_block += f"[Paper {i}] {p['title']}\n"
         paper_block += f"Categories: {', '.join(terms)}\n"
-        paper_block += f"Abstract: {p['summary']}\n\n"
-
-    prompt = (
-        f"Please summarise the following {len(papers)} ArXiv paper(s):\n\n"
-        f"{paper_block}"
-        f"\nProduce the full structured summary as instructed."
-    )
-
-    messages = [
-        SystemMessage(content=SUMMARISE_SYSTEM),
-        HumanMessage(content=prompt),
-    ]
-    response = llm.invoke(messages)
-    return response.content
+        paper_block += f"Abstract: {digests.get(p['id'], p['summary'])}\n\n"
 
-# ═════════════════════════════════════════════════════════════════════════════
-# PDF GENERATION
-# ═════════════════════════════════════════════════════════════════════════════
-def generate_pdf(title: str, content: str, paper_meta: list = None) -> bytes:
-    """
-    Generate a formatted A4 PDF from the AI response content.
-    paper_meta: optional list of paper dicts appended as an Appendix section.
-    """
-    try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import cm
-        from reportlab.lib import colors
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, HRFlowable
-        from reportlab.lib.enums import TA_CENTER
-
-        buf = BytesIO()
-        doc = SimpleDocTemplate(
-            buf, pagesize=A4,
-            leftMargin=2.5*cm, rightMargin=2.5*cm,
-            topMargin=2.5*cm,  bottomMargin=2.5*cm
-        )
-
-        styles   = getSampleStyleSheet()
-        clr_blue = colors.HexColor('#1a73e8')
-        clr_grey = colors.HexColor('#5f6368')
-        clr_div  = colors.HexColor('#dadce0')
-
-        title_style = ParagraphStyle(
-            'RMTitle', parent=styles['Title'],
-            fontSize=22, textColor=clr_blue,
-            spaceAfter=6, alignment=TA_CENTER
-        )
-        subtitle_style = ParagraphStyle(
-            'RMSub', parent=styles['Normal'],
-            fontSize=12, textColor=clr_blue,
-            spaceAfter=4, alignment=TA_CENTER,
-            fontName='Helvetica-BoldOblique'
-        )
-        meta_style = ParagraphStyle(
-            'RMMeta', parent=styles['Normal'],
-            fontSize=10, textColor=clr_grey,
-            alignment=TA_CENTER, spaceAfter=16
-        )
-        h2_style = ParagraphStyle(
-            'RMH2', parent=styles['Heading2'],
-            fontSize=14, textColor=clr_blue,
-            spaceBefore=18, spaceAfter=6
-        )
-        h3_style = ParagraphStyle(
-            'RMH3', parent=styles['Heading3'],
-            fontSize=12, textColor=colors.HexColor('#34a853'),
-            spaceBefore=12, spaceAfter=4
-        )
-        body_style = ParagraphStyle(
-            'RMBody', parent=styles['Normal'],
-            fontSize=11, leading=18, spaceAfter=8
-        )
-        bullet_style = ParagraphStyle(
-            'RMBullet', parent=styles['Normal'],
-            fontSize=11, leading=18, spaceAfter=6, leftIndent=16
-        )
-        small_style = ParagraphStyle(
-            'RMSmall', parent=styles['Normal'],
-            fontSize=9, textColor=clr_grey, leading=14, spaceAfter=6
-        )
-
-        story = []
-
-        # ── Cover block ──
-        story.append(Spacer(1, 0.5*cm))
-        story.append(Paragraph("ResearchMind AI", title_style))
-        story.append(Paragraph("ArXiv Research Summary Report", subtitle_style))
-        story.append(Spacer(1, 0.3*cm))
-        story.append(Paragraph(f"<b>Topic:</b> {title}", meta_style))
-        story.append(Paragraph(
-            f"Generated: {datetime.datetime.now().strftime('%B %d, %Y  %H:%M')}",
-            meta_style
-        ))
-        story.append(HRFlowable(width="100%", thickness=1.5, color=clr_blue))
-        story.append(Spacer(1, 0.4*cm))
-
-        # ── Main content ──
-        for line in content.split('\n'):
-            line = line.strip()
-            if not line:
-                story.append(Spacer(1, 0.18*cm))
-                continue
-            if line.startswith('### '):
-                story.append(Paragraph(line[4:].strip(), h3_style))
-            elif line.startswith('## ') or line.startswith('# '):
-                story.append(Paragraph(line.lstrip('#').strip(), h2_style))
-            elif line.startswith('- ') or line.startswith('* '):
-                clean = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', line[2:])
-                clean = re.sub(r'\*(.*?)\*',    r'<i>\1</i>', clean)
-                story.append(Paragraph(f"• {clean}", bullet_style))
-            elif re.match(r'^\d+\.\s', line):
-                clean = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', line)
-                clean = re.sub(r'\*(.*?)\*',    r'<i>\1</i>', clean)
-                story.append(Paragraph(clean, bullet_style))
-            else:
-                clean = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', line)
-                clean = re.sub(r'\*(.*?)\*',    r'<i>\1</i>', clean)
-                story.append(Paragraph(clean, body_style))
-
-        # ── Appendix: full paper abstracts ──
-        if paper_meta:
-            story.append(Spacer(1, 0.6*cm))
-            story.append(HRFlowable(width="100%", thickness=1, color=clr_div))
-            story.append(Spacer(1, 0.2*cm))
-            story.append(Paragraph("Appendix — Retrieved ArXiv Papers", h2_style))
-            story.append(Spacer(1, 0.2*cm))
-            for idx, p in enumerate(paper_meta, 1):
-                terms = parse_terms(p["terms"])
-                story.append(Paragraph(f"{idx}. {p['title']}", h3_style))
-                story.append(Paragraph(
-                    f"<b>Categories:</b> {', '.join(terms)}", small_style
-                ))
-                story.append(Paragraph(
-                    p["summary"].replace('\n', ' '), small_style
-                ))
-                story.append(Spacer(1, 0.2*cm))
-
-        # ── Footer ──
-        story.append(Spacer(1, 0.5*cm))
-        story.append(HRFlowable(width="100%", thickness=0.5, color=clr_div))
-        story.append(Paragraph(
-            "Generated by ResearchMind AI — LLM-Based Multi-Agent Academic Research System",
-            meta_style
-        ))
-
-        doc.build(story)
-        return buf.getvalue()
-
-    except ImportError:
-        return b""
+    context = f"ATTACHED ARXIV PAPERS ({len(papers)}):\n\n{paper_block}"
+    return invoke_with_stats(llm, build_chat_messages(SYSTEM_PROMPT, history, query, context,
+                                                      instructions=SUMMARY_FORMAT))
 
 # ═════════════════════════════════════════════════════════════════════════════
 # QUERY CLASSIFICATION
@@ -319,17 +198,23 @@ def wants_image(text: str) -> bool:
     return any(w in text.lower() for w in
                ["image","picture","diagram","figure","show me","visualize"])
 
+def refers_to_previous(text: str) -> bool:
+    """'summarise these', 'export those' — the papers of the previous answer."""
+    return bool(re.search(r"\b(these|those|them|above)\b", text.lower()))
+
 # ═════════════════════════════════════════════════════════════════════════════
 # SYSTEM PROMPTS
 # ═════════════════════════════════════════════════════════════════════════════
-NORMAL_SYSTEM = """You are ResearchMind AI — a smart, friendly assistant specialised in academic research.
-For casual conversation, respond naturally and concisely. Be warm, clear, and helpful."""
+# The only system prompt: identical on every chat turn, so a switch between casual and
+# research questions never invalidates Ollama's cached prefix. What differs per turn
+# (answer structure, retrieved papers) is appended to the user's message instead.
+SYSTEM_PROMPT = """You are ResearchMind AI — a smart, friendly assistant specialised in academic research, backed by a database of 51,000+ ArXiv papers.
 
-RESEARCH_SYSTEM_TEMPLATE = """You are ResearchMind AI — an expert academic research assistant powered by a database of 51,000+ ArXiv papers.
+For casual conversation, respond naturally and concisely. Be warm, clear, and helpful.
 
-{context}
+Some messages end with answer instructions and papers retrieved from the dataset. Follow those instructions for that answer, and only attribute to a paper what its abstract says."""
 
-Using the papers above (if any were found) AND your own knowledge, answer the user's question in this structure:
+RESEARCH_FORMAT = """Using the ArXiv papers attached below (if any were found) AND your own knowledge, answer the question above in this structure:
 
 ## Overview
 [2-3 sentence summary]
@@ -356,18 +241,77 @@ Be thorough, academic, yet accessible. Always connect findings to the retrieved
 # ═════════════════════════════════════════════════════════════════════════════
 @st.cache_resource
 def get_llm():
-    return ChatOllama(model="llama3.2", temperature=0.7)
+    from langchain_ollama import ChatOllama
+    return ChatOllama(model=LLM_MODEL, temperature=0.7, **llm_options())
+
+# ═════════════════════════════════════════════════════════════════════════════
+# SESSION STORE
+# ═════════════════════════════════════════════════════════════════════════════
+@st.cache_resource
+def get_session_store():
+    return SessionStore()
+
+def client_key() -> str:
+    """
+    Owner key of this browser's chat sessions. The store is shared by the whole process,
+    so the key is kept in the URL (?client=...) where it survives reloads and bookmarks;
+    anyone given that URL can see the same history.
+    """
+    if "client_key" not in st.session_state:
+        key = st.query_params.get("client", "")
+        if not re.fullmatch(r"[0-9a-f]{32}", key):
+            key = uuid.uuid4().hex
+        st.session_state.client_key = key
+    st.query_params["client"] = st.session_state.client_key
+    return st.session_state.client_key
+
+# ═════════════════════════════════════════════════════════════════════════════
+# SPECULATIVE PREFETCH
+# ═════════════════════════════════════════════════════════════════════════════
+@st.cache_resource
+def get_prefetcher():
+    return Prefetcher()
+
+def pdf_key(topic: str, content: str, paper_meta: list = None) -> tuple:
+    return ("pdf", topic, content, tuple(p["id"] for p in paper_meta or []))
+
+def prefetch_suggestions(prefetcher: Prefetcher, index: PositionalIndex, category_filter: str = None,
+                         n_probe: int = None):
+    """Retrieval for the welcome chips, so a click goes straight to the LLM."""
+    for _, text in SUGGESTIONS:
+        if is_research_query(text) or wants_summarise(text):
+            prefetcher.submit(("retrieve", text, category_filter, n_probe),
+                              lambda q=text: retrieve(q, index, category_filter, digest_store,
+                                                      related_graph, n_probe))
+
+def prefetch_follow_ups(prefetcher: Prefetcher, topic: str, content: str, found: list, llm, digests: dict,
+                        history: list = ()):
+    """
+    After a research answer, prepare the obvious next asks: "generate a PDF" (this
+    answer, rendered) and, with PREFETCH_LLM_DRAFTS, "summarise these" (an LLM draft
+    over its papers).
+    """
+    prefetcher.submit(pdf_key(topic, content), lambda: generate_pdf(topic, content, None))
+    if found and PREFETCH_LLM_DRAFTS:
+        prefetcher.submit(("summary", tuple(p["id"] for p in found)),
+                          lambda: summarise_papers(found, llm, digests, history), llm=True)
 
 # ═════════════════════════════════════════════════════════════════════════════
 # SESSION STATE
 # ═════════════════════════════════════════════════════════════════════════════
 defaults = {
     "messages":              [],
-    "chat_history":          ["Welcome Chat"],
+    "session_id":            None,
+    "sidebar_page":          0,
     "last_research_topic":   "",
     "last_research_content": "",
     "selected_category":     "All",
+    "last_facets":           {},
+    "last_search":           None,
     "dataset_loaded":        False,
+    "message_window":        MESSAGE_WINDOW,
+    "render_cache":          {},
+    "cluster_pruned":        False,
 }
 for k, v in defaults.items():
     if k not in st.session_state:
@@ -376,25 +320,47 @@ for k, v in defaults.items():
 # ═════════════════════════════════════════════════════════════════════════════
 # LOAD DATA
 # ═════════════════════════════════════════════════════════════════════════════
-papers = load_dataset(DATASET_PATH)
-if papers and not st.session_state.dataset_loaded:
-    st.session_state.dataset_loaded = True
+warmup       = get_warmup(DATASET_PATH)
+search_index = warmup.index if warmup.ready else None
+papers       = search_index.papers if search_index else []
+store        = get_session_store()
+owner        = client_key()
+digest_store = get_digest_store(digest_path(DATASET_PATH), len(papers), papers) if papers else None
+related_graph = get_related_graph(related_path(DATASET_PATH), len(papers)) if papers else None
+st.session_state.dataset_loaded = warmup.ready
 
 # ═════════════════════════════════════════════════════════════════════════════
 # RENDER UI SHELL
 # ═════════════════════════════════════════════════════════════════════════════
-render_sidebar(papers)
+render_sidebar(papers, store, owner, warmup)
 render_topbar()
 
 st.markdown("<div style='margin-top:60px;'></div>", unsafe_allow_html=True)
 
+suggestion = None
 if not st.session_state.messages:
-    render_welcome(papers)
+    suggestion = render_welcome(papers)
+
+render_messages(papers, related_graph)
 
-render_messages(papers)
+# ── A chip switch re-filters the last search from its cached candidate set ──
+last_search = st.session_state.last_search
+if search_index is not None and last_search and st.session_state.selected_category != last_search["category"]:
+    category = st.session_state.selected_category
+    found, _ = search_papers(last_search["query"], search_index, top_k=5,
+                             category_filter=category, n_probe=last_search["n_probe"])
+    render_filtered_papers(last_search["query"], category, found)
 
 CATEGORIES = ["All", "Machine Learning", "Computer Vision", "NLP", "AI", "Robotics", "Systems"]
-user_input = render_input_panel(papers, CATEGORIES)
+user_input = render_input_panel(papers, CATEGORIES, st.session_state.last_facets) or suggestion
+warmup.mark("ui shell rendered", once=True)
+
+# Prepared while the user reads; only used if they then ask exactly this
+prefetcher = get_prefetcher()
+if search_index is not None and not st.session_state.messages and not user_input:
+    selected = st.session_state.selected_category
+    prefetch_suggestions(prefetcher, search_index, selected if selected != "All" else None,
+                         CLUSTER_PROBE if st.session_state.cluster_pruned else None)
 
 # ═════════════════════════════════════════════════════════════════════════════
 # HANDLE INPUT
@@ -406,123 +372,172 @@ if user_input and user_input.strip():
     summarise_mode  = wants_summarise(query)
     image_requested = wants_image(query)
     category_filter = st.session_state.selected_category
-
-    # ── Update sidebar chat history label ──
-    if len(st.session_state.chat_history) == 1 and st.session_state.chat_history[0] == "Welcome Chat":
-        st.session_state.chat_history[0] = query[:40] + ("..." if len(query) > 40 else "")
-    else:
-        st.session_state.chat_history.insert(0, query[:40] + ("..." if len(query) > 40 else ""))
-
-    st.session_state.messages.append({"role": "user", "content": query, "research": False})
-
-    # ── Search dataset ──
-    retrieved_papers = []
-    context_str      = ""
-    if papers and (research_mode or summarise_mode):
-        retrieved_papers = search_papers(
-            query, papers, top_k=5,
-            category_filter=category_filter if category_filter != "All" else None
-        )
-        context_str = build_context_from_papers(retrieved_papers)
-
-    llm     = get_llm()
-    ai_text = ""
-
-    # ── SUMMARISE path ──
-    if summarise_mode and retrieved_papers:
-        with st.spinner("📝 Summarising retrieved papers..."):
-            try:
-                ai_text       = summarise_papers(retrieved_papers, llm)
-                research_mode = True   # enables PDF + research badge
-            except Exception as e:
-                ai_text          = f"⚠️ Summarisation failed: {e}"
-                research_mode    = False
-                retrieved_papers = []
-
-    # ── RESEARCH / NORMAL path ──
-    else:
-        system_content = (
-            RESEARCH_SYSTEM_TEMPLATE.format(
-                context=context_str or "No papers retrieved from dataset for this query."
-            )
-            if research_mode else NORMAL_SYSTEM
-        )
-
-        lc_messages = [SystemMessage(content=system_content)]
-        for m in st.session_state.messages[:-1]:
-            if m["role"] == "user":
-                lc_messages.append(HumanMessage(content=m["content"]))
+    category_filter = category_filter if category_filter != "All" else None
+    n_probe         = CLUSTER_PROBE if st.session_state.cluster_pruned else None
+    prefetcher.foreground()
+    try:
+        # ── Persist the turn; the first message opens a new session ──
+        if st.session_state.session_id is None:
+            st.session_state.session_id   = store.create_session(owner, session_title(query))
+            st.session_state.sidebar_page = 0
+
+        user_msg = {"id": uuid.uuid4().hex, "role": "user", "content": query, "research": False}
+        st.session_state.messages.append(user_msg)
+        store.append_message(st.session_state.session_id, user_msg)
+
+        # ── The first question may arrive before the background index build finishes ──
+        if search_index is None:
+            with st.spinner("📚 Loading ArXiv index..."):
+                search_index = warmup.wait()
+            papers = search_index.papers
+            related_graph = get_related_graph(related_path(DATASET_PATH), len(papers)) if papers else None
+            digest_store  = get_digest_store(digest_path(DATASET_PATH), len(papers), papers) if papers else None
+
+        # ── Search dataset ──
+        retrieved_papers = []
+        digests          = {}
+        corrections      = {}
+        context_str      = ""
+        previous_papers  = next((m["retrieved_papers"] for m in reversed(st.session_state.messages)
+                                 if m.get("retrieved_papers")), [])
+        if summarise_mode and refers_to_previous(query) and previous_papers:
+            retrieved_papers = previous_papers
+            if digest_store:
+                digests = digest_store.get_many([p["id"] for p in retrieved_papers])
+        elif papers and (research_mode or summarise_mode):
+            hit = (prefetcher.take(("retrieve", query, category_filter, n_probe))
+                   or retrieve(query, search_index, category_filter, digest_store, related_graph, n_probe))
+            search_query     = hit["search_query"]
+            corrections      = hit["corrections"]
+            retrieved_papers = hit["papers"]
+            digests          = hit["digests"]
+            st.session_state.last_facets = hit["facets"]
+            st.session_state.last_search = {"query": search_query, "category": category_filter or "All",
+                                            "n_probe": n_probe}
+            context_str = build_context_from_papers(retrieved_papers, digests, hit["related"])
+        else:
+            # Chips would otherwise keep showing counts for an older question
+            st.session_state.last_facets = {}
+            st.session_state.last_search = None
+
+        llm     = get_llm()
+        ai_text = ""
+        stats   = {}
+
+        # ── SUMMARISE path ──
+        if summarise_mode and retrieved_papers:
+            with st.spinner("📝 Summarising retrieved papers..."):
+                try:
+                    drafted = prefetcher.take(("summary", tuple(p["id"] for p in retrieved_papers)))
+                    if drafted:
+                        ai_text, stats = drafted[0], {**drafted[1], "prefetched": True}
+                    else:
+                        ai_text, stats = summarise_papers(retrieved_papers, llm, digests,
+                                                          st.session_state.messages[:-1], query)
+                    research_mode = True   # enables PDF + research badge
+                except Exception as e:
+                    ai_text          = f"⚠️ Summarisation failed: {e}"
+                    research_mode    = False
+                    retrieved_papers = []
+
+        # ── RESEARCH / NORMAL path ──
+        else:
+            if research_mode:
+                lc_messages = build_chat_messages(
+                    SYSTEM_PROMPT, st.session_state.messages[:-1], query,
+                    context=context_str or "No papers retrieved from dataset for this query.",
+                    instructions=RESEARCH_FORMAT,
+                )
             else:
-                lc_messages.append(AIMessage(content=m["content"]))
-        lc_messages.append(HumanMessage(content=query))
-
-        spinner_msg = "🔬 Searching dataset & generating answer..." if research_mode else "💬 Thinking..."
-        with st.spinner(spinner_msg):
+                lc_messages = build_chat_messages(SYSTEM_PROMPT, st.session_state.messages[:-1], query)
+
+            spinner_msg = "🔬 Searching dataset & generating answer..." if research_mode else "💬 Thinking..."
+            with st.spinner(spinner_msg):
+                try:
+                    ai_text, stats = invoke_with_stats(llm, lc_messages)
+                except Exception as e:
+                    ai_text          = (
+                        f"⚠️ Could not connect to Ollama. Make sure it is running with "
+                        f"`ollama serve` and the model is pulled with `ollama pull llama3.2`.\n\nError: {e}"
+                    )
+                    research_mode    = False
+                    retrieved_papers = []
+
+        # ── Cache research content for future PDF requests ──
+        if research_mode:
+            st.session_state.last_research_topic   = query
+            st.session_state.last_research_content = ai_text
+
+        # ── Image ──
+        img_url = None
+        if image_requested:
             try:
-                response = llm.invoke(lc_messages)
-                ai_text  = response.content
-            except Exception as e:
-                ai_text          = (
-                    f"⚠️ Could not connect to Ollama. Make sure it is running with "
-                    f"`ollama serve` and the model is pulled with `ollama pull llama3.2`.\n\nError: {e}"
+                search_term = re.sub(
+                    r'(show|image|picture|diagram|figure|of|me|a|an|the)', '', query.lower()
+                ).strip().replace(' ', ',')
+                img_url = f"https://source.unsplash.com/800x400/?{search_term}"
+            except:
+                img_url = None
+
+        # ── PDF ──
+        # Triggers when: user asks for pdf/download/export/save/report/document
+        #             OR when summarise produced a result (auto PDF)
+        pdf_bytes = None
+        pdf_topic = ""
+
+        should_make_pdf = pdf_requested or (summarise_mode and research_mode and ai_text)
+
+        if should_make_pdf:
+            topic           = st.session_state.last_research_topic   or query
+            content_for_pdf = st.session_state.last_research_content or ai_text
+
+            paper_meta      = retrieved_papers if retrieved_papers else None
+
+            pdf_bytes = prefetcher.take(pdf_key(topic, content_for_pdf, paper_meta))
+            if pdf_bytes is None:
+                with st.spinner("📄 Generating PDF..."):
+                    pdf_bytes = generate_pdf(
+                        title      = topic,
+                        content    = content_for_pdf,
+                        paper_meta = paper_meta,
+                    )
+            pdf_topic = topic
+
+            if not pdf_bytes:
+                ai_text += (
+                    "\n\n> ⚠️ PDF generation requires `reportlab`."
+                    " Install with: `pip install reportlab`"
                 )
-                research_mode    = False
-                retrieved_papers = []
-
-    # ── Cache research content for future PDF requests ──
-    if research_mode:
-        st.session_state.last_research_topic   = query
-        st.session_state.last_research_content = ai_text
-
-    # ── Image ──
-    img_url = None
-    if image_requested:
-        try:
-            search_term = re.sub(
-                r'(show|image|picture|diagram|figure|of|me|a|an|the)', '', query.lower()
-            ).strip().replace(' ', ',')
-            img_url = f"https://source.unsplash.com/800x400/?{search_term}"
-        except:
-            img_url = None
-
-    # ── PDF ──
-    # Triggers when: user asks for pdf/download/export/save/report/document
-    #             OR when summarise produced a result (auto PDF)
-    pdf_bytes = None
-    pdf_topic = ""
-
-    should_make_pdf = pdf_requested or (summarise_mode and research_mode and ai_text)
-
-    if should_make_pdf:
-        topic           = st.session_state.last_research_topic   or query
-        content_for_pdf = st.session_state.last_research_content or ai_text
-
-        with st.spinner("📄 Generating PDF..."):
-            pdf_bytes = generate_pdf(
-                title      = topic,
-                content    = content_for_pdf,
-                paper_meta = retrieved_papers if retrieved_papers else None,
-            )
-        pdf_topic = topic
-
-        if not pdf_bytes:
-            ai_text += (
-                "\n\n> ⚠️ PDF generation requires `reportlab`."
-                " Install with: `pip install reportlab`"
-            )
-
-    # ── Save assistant message ──
-    msg_obj = {
-        "role":             "assistant",
-        "content":          ai_text,
-        "research":         research_mode,
-        "retrieved_papers": retrieved_papers,
-    }
-    if img_url:
-        msg_obj["image_url"] = img_url
-    if pdf_bytes:
-        msg_obj["pdf_bytes"] = pdf_bytes
-        msg_obj["pdf_topic"] = pdf_topic
 
-    st.session_state.messages.append(msg_obj)
+        if corrections and retrieved_papers:
+            ai_text = f"> 🔎 Showing papers for *{search_query}*\n\n" + ai_text
+
+        # ── Save assistant message ──
+        msg_id  = uuid.uuid4().hex
+        msg_obj = {
+            "id":               msg_id,
+            "role":             "assistant",
+            "content":          ai_text,
+            "research":         research_mode,
+            "retrieved_papers": retrieved_papers,
+        }
+        if stats:
+            msg_obj["stats"] = stats
+        if img_url:
+            msg_obj["image_url"] = img_url
+        if pdf_bytes:
+            msg_obj["pdf_path"]  = store.save_pdf(msg_id, pdf_bytes)
+            msg_obj["pdf_topic"] = pdf_topic
+
+        st.session_state.messages.append(msg_obj)
+        store.append_message(st.session_state.session_id, msg_obj)
+    finally:
+        # An interrupted run (new input, stop, rerun) must not hold off prefetching
+        prefetcher.idle()
+
+    if research_mode and not pdf_bytes:
+        prefetch_follow_ups(prefetcher, st.session_state.last_research_topic,
+                            st.session_state.last_research_content,
+                            [] if summarise_mode else retrieved_papers, llm, digests,
+                            list(st.session_state.messages))
     st.rerun()
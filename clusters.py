@@ -0,0 +1,281 @@
+"""
+Offline topic clustering of the corpus.
+
+    python clusters.py --k 64
+    python clusters.py --evaluate --n-probe 4 --queries-file queries.txt
+
+Papers are grouped by mini-batch spherical k-means over the same TF-IDF features
+as related.py. Each cluster is labelled with its heaviest centroid terms. The
+build writes two files next to the dataset:
+
+    arxiv_data.clusters.bin    one uint16 cluster ID per paper
+    arxiv_data.clusters.json   labels, sizes, exemplar papers and truncated centroids
+
+With clusters attached, the index can score only the few clusters whose centroids
+best match a query (search_faceted(..., n_probe=...)). The build measures how
+much of the exhaustive top-k that keeps and stores it with the clusters.
+"""
+import os
+import json
+import time
+import random
+import argparse
+from array import array
+from collections import Counter
+from itertools import chain
+
+from dataset import DATASET_PATH, artifact_path, read_papers
+from search_index import PositionalIndex
+
+CLUSTER_K       = 64
+BATCH_SIZE      = 2048
+ITERATIONS      = 150
+CENTROID_TERMS  = 200   # heaviest centroid terms kept for query probing
+LABEL_TERMS     = 3
+EXEMPLARS       = 5     # papers closest to each centroid, shown in the topic map
+CLUSTER_PROBE   = 4     # clusters scored per query in cluster-pruned search
+EVAL_QUERIES    = 200
+
+
+def clusters_path(dataset_path: str = DATASET_PATH) -> str:
+    return artifact_path(dataset_path, ".clusters")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BUILD
+# ══════════════════════════════════════════════════════════════════════════════
+def minibatch_kmeans(X, k: int = CLUSTER_K, batch_size: int = BATCH_SIZE,
+                     iterations: int = ITERATIONS, seed: int = 0, log=print):
+    """
+    Spherical mini-batch k-means on L2-normalised rows of X (Sculley, 2010): each step
+    assigns one random batch by cosine similarity and moves every hit centroid towards
+    its batch mean with a per-centroid learning rate of 1 / papers seen.
+    Returns unit-length dense centroids (k x features).
+    """
+    import numpy as np
+    from scipy import sparse
+
+    rng    = np.random.default_rng(seed)
+    n_docs = X.shape[0]
+    centroids = X[rng.choice(n_docs, k, replace=False)].toarray()
+    seen      = np.zeros(k)
+
+    for step in range(iterations):
+        batch   = X[rng.choice(n_docs, min(batch_size, n_docs), replace=False)]
+        nearest = np.asarray(batch @ centroids.T).argmax(axis=1)
+        members = sparse.csr_matrix(
+            (np.ones(len(nearest), dtype=np.float32), (nearest, np.arange(len(nearest)))),
+            shape=(k, batch.shape[0]),
+        )
+        sums = (members @ batch).toarray()
+        hits = np.bincount(nearest, minlength=k)
+        seen += hits
+
+        moved = hits > 0
+        eta   = (hits[moved] / seen[moved])[:, None]
+        centroids[moved] = (1 - eta) * centroids[moved] + eta * sums[moved] / hits[moved][:, None]
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms > 0, norms, 1)
+        if step % 50 == 0:
+            log(f"… step {step}/{iterations}, {int(moved.sum())} clusters updated")
+    return centroids
+
+
+def assign(X, centroids, block: int = 8192):
+    """(cluster ID, cosine similarity to that centroid) for every row of X."""
+    import numpy as np
+
+    labels = np.zeros(X.shape[0], dtype=np.uint16)
+    sims   = np.zeros(X.shape[0], dtype=np.float32)
+    for start in range(0, X.shape[0], block):
+        block_sims = np.asarray(X[start:start + block] @ centroids.T)
+        labels[start:start + block] = block_sims.argmax(axis=1)
+        sims[start:start + block]   = block_sims.max(axis=1)
+    return labels, sims
+
+
+def describe(centroids, labels, sims, vocab: list) -> list:
+    """Per-cluster label, size, exemplar paper IDs and truncated centroid weights."""
+    import numpy as np
+
+    clusters = []
+    for cid, centroid in enumerate(centroids):
+        members = np.flatnonzero(labels == cid)
+        heavy   = np.argsort(-centroid)[:CENTROID_TERMS]
+        heavy   = heavy[centroid[heavy] > 0]
+        best    = members[np.argsort(-sims[members], kind="stable")[:EXEMPLARS]]
+        clusters.append({
+            "label":     " · ".join(vocab[t] for t in heavy[:LABEL_TERMS]),
+            "size":      int(len(members)),
+            "exemplars": best.tolist(),
+            "terms":     {vocab[t]: round(float(centroid[t]), 5) for t in heavy},
+        })
+    return clusters
+
+
+def save_clusters(path: str, labels, meta: dict):
+    """Assignments first, then the JSON, which marks the pair complete."""
+    labels.astype("<u2").tofile(path + ".bin.tmp")
+    os.replace(path + ".bin.tmp", path + ".bin")
+    with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(path + ".json.tmp", path + ".json")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# LOOKUP
+# ══════════════════════════════════════════════════════════════════════════════
+class TopicClusters:
+    """
+    Cluster assignments as one sorted doc-ID array per cluster, plus an inverted map
+    from centroid terms to (cluster, weight) so picking the closest clusters for a
+    query only touches the query's own terms.
+    """
+
+    def __init__(self, meta: dict, assignments: array):
+        self.meta      = meta
+        self.clusters  = meta["clusters"]
+        self.n_papers  = len(assignments)
+
+        self.members = [array('I') for _ in self.clusters]
+        for doc, cid in enumerate(assignments):
+            self.members[cid].append(doc)
+
+        self.term_weights = {}
+        for cid, cluster in enumerate(self.clusters):
+            for term, weight in cluster["terms"].items():
+                self.term_weights.setdefault(term, []).append((cid, weight))
+
+    def __len__(self) -> int:
+        return len(self.clusters)
+
+    def probe(self, terms: list, n_probe: int = CLUSTER_PROBE) -> tuple:
+        """IDs of the `n_probe` clusters whose centroids weigh the query terms most."""
+        weights = Counter()
+        for term in terms:
+            for cid, weight in self.term_weights.get(term, ()):
+                weights[cid] += weight
+        return tuple(sorted(cid for cid, _ in weights.most_common(n_probe)))
+
+    def allowed(self, cluster_ids: tuple) -> array:
+        """Sorted doc IDs of the given clusters, for PositionalIndex.score_within()."""
+        return array('I', sorted(chain.from_iterable(self.members[cid] for cid in cluster_ids)))
+
+
+def load_clusters(path: str, n_papers: int):
+    """The saved clusters, or None if missing or built for a different dataset snapshot."""
+    try:
+        with open(path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        assignments = array('H')
+        with open(path + ".bin", "rb") as f:
+            assignments.frombytes(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+    if len(assignments) != n_papers or meta.get("n_papers") != n_papers:
+        return None
+    return TopicClusters(meta, assignments)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# EVALUATION
+# ══════════════════════════════════════════════════════════════════════════════
+def sample_queries(papers: list, n: int = EVAL_QUERIES, seed: int = 0) -> list:
+    """Short title prefixes of random papers, standing in for user queries."""
+    rng = random.Random(seed)
+    picks = rng.sample(papers, min(n, len(papers)))
+    return [" ".join(p["title"].split()[:4]) for p in picks]
+
+
+def evaluate(index: PositionalIndex, queries: list, n_probe: int = CLUSTER_PROBE,
+             top_k: int = 5) -> dict:
+    """Recall@k of cluster-pruned search against the exhaustive path, and the time of each."""
+    kept, total = 0, 0
+    full_s, pruned_s = 0.0, 0.0
+    for query in queries:
+        # Both paths share the scored-candidate cache; start each timed call cold
+        index._cache.clear()
+        started = time.perf_counter()
+        exact = index.search(query, top_k)
+        full_s += time.perf_counter() - started
+
+        index._cache.clear()
+        started = time.perf_counter()
+        pruned = index.search(query, top_k, n_probe=n_probe)
+        pruned_s += time.perf_counter() - started
+
+        exact_ids = {p["id"] for p in exact}
+        kept  += len(exact_ids & {p["id"] for p in pruned})
+        total += len(exact_ids)
+    n = max(len(queries), 1)
+    return {
+        "n_probe":   n_probe,
+        "queries":   len(queries),
+        "top_k":     top_k,
+        "recall":    round(kept / total, 4) if total else None,
+        "full_ms":   round(full_s * 1000 / n, 2),
+        "pruned_ms": round(pruned_s * 1000 / n, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster the corpus into browseable topics.")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--k", type=int, default=CLUSTER_K)
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--n-probe", type=int, default=CLUSTER_PROBE)
+    parser.add_argument("--evaluate", action="store_true",
+                        help="only measure pruned-search recall against existing clusters")
+    parser.add_argument("--queries-file", help="one evaluation query per line (default: sampled titles)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    papers  = read_papers(args.dataset)
+    if not papers:
+        raise SystemExit(f"No papers found in {args.dataset}")
+    index = PositionalIndex(papers)
+    out   = clusters_path(args.dataset)
+
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = sample_queries(papers)
+
+    if not args.evaluate:
+        if not 1 <= args.k < 1 << 16:
+            raise SystemExit("--k must be between 1 and 65535")
+        try:
+            from related import tfidf_features
+            X, vocab = tfidf_features(index)
+        except ImportError:
+            raise SystemExit("Clustering requires numpy and scipy. Install with: pip install numpy scipy")
+
+        centroids    = minibatch_kmeans(X, min(args.k, len(papers)), args.batch_size, args.iterations)
+        labels, sims = assign(X, centroids)
+        save_clusters(out, labels, {
+            "n_papers": len(papers),
+            "k":        len(centroids),
+            "built_at": time.time(),
+            "clusters": describe(centroids, labels, sims, vocab),
+        })
+        print(f"{len(centroids)} clusters over {len(papers):,} papers "
+              f"({time.perf_counter() - started:.1f} s)")
+
+    index.clusters = load_clusters(out, len(papers))
+    if index.clusters is None:
+        raise SystemExit(f"No clusters for this dataset at {out}.json; build them first")
+    report = evaluate(index, queries, args.n_probe)
+    print(json.dumps(report))
+
+    # Keep the measurement with the clusters so the app can show it next to the toggle
+    meta = index.clusters.meta
+    meta["eval"] = report
+    with open(out + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(out + ".json.tmp", out + ".json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import os
+import csv
+import ast
+import hashlib
+from array import array
+from collections.abc import Sequence
+
+DATASET_PATH = "arxiv_data.csv"
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+def parse_terms(terms_str):
+    if isinstance(terms_str, list):
+        return terms_str
+    try:
+        return ast.literal_eval(terms_str)
+    except:
+        return []
+
+
+def artifact_path(dataset_path: str, suffix: str) -> str:
+    """Path of a precomputed artifact stored next to the dataset, e.g. arxiv_data.digests.sqlite."""
+    return os.path.splitext(dataset_path)[0] + suffix
+
+
+def dataset_fingerprint(papers) -> str:
+    """Content hash of every row's title and abstract, in row order (row index = paper ID)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for p in papers:
+        digest.update(f"{p['title']}\0{p['summary']}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PAPER TABLE
+# ══════════════════════════════════════════════════════════════════════════════
+class Paper:
+    """
+    Read-only view of one PaperTable row with the familiar p["title"] / p.get("terms")
+    access. Fields are decoded on access; the view itself is two slots.
+    """
+    __slots__ = ("table", "id")
+
+    FIELDS = ("id", "title", "summary", "terms")
+
+    def __init__(self, table, paper_id: int):
+        self.table = table
+        self.id    = paper_id
+
+    def __getitem__(self, key: str):
+        if key == "id":
+            return self.id
+        if key == "title":
+            return self.table.title(self.id)
+        if key == "summary":
+            return self.table.summary(self.id)
+        if key == "terms":
+            return self.table.terms(self.id)
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> dict:
+        return {key: self[key] for key in self.FIELDS}
+
+    def __reduce__(self):
+        # Pickle as a plain dict rather than dragging the whole table along
+        return dict, (self.to_dict(),)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Paper) and other.table is self.table and other.id == self.id
+
+    def __hash__(self) -> int:
+        return hash((id(self.table), self.id))
+
+    def __repr__(self) -> str:
+        return f"Paper({self.id}, {self['title'][:40]!r})"
+
+
+class PaperTable(Sequence):
+    """
+    Column store for the corpus. Titles and abstracts are UTF-8 in one shared buffer,
+    addressed by offsets (row i: title [2i, 2i+1), abstract [2i+1, 2i+2)); categories
+    are small integer IDs into `categories`. The row index is the paper ID.
+
+    Indexing yields Paper views, so callers keep writing p["title"], while the table
+    itself holds a handful of large objects instead of a dict and three strings per row.
+    """
+
+    def __init__(self):
+        self.categories    = []          # category ID -> name, e.g. "cs.LG"
+        self._category_ids = {}
+        self._text         = bytearray()
+        self._offsets      = array('Q', [0])
+        self._cat_offsets  = array('I', [0])
+        self._cat_ids      = array('H')
+
+    def append(self, title: str, summary: str, terms: list) -> int:
+        for field in (title, summary):
+            self._text += field.encode("utf-8")
+            self._offsets.append(len(self._text))
+        for term in terms:
+            cid = self._category_ids.get(term)
+            if cid is None:
+                cid = self._category_ids[term] = len(self.categories)
+                self.categories.append(term)
+            self._cat_ids.append(cid)
+        self._cat_offsets.append(len(self._cat_ids))
+        return len(self) - 1
+
+    def __len__(self) -> int:
+        return len(self._cat_offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [Paper(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("paper index out of range")
+        return Paper(self, i)
+
+    def __iter__(self):
+        return (Paper(self, i) for i in range(len(self)))
+
+    def title(self, i: int) -> str:
+        return self._text[self._offsets[2 * i]:self._offsets[2 * i + 1]].decode("utf-8")
+
+    def summary(self, i: int) -> str:
+        return self._text[self._offsets[2 * i + 1]:self._offsets[2 * i + 2]].decode("utf-8")
+
+    def category_ids(self, i: int) -> array:
+        return self._cat_ids[self._cat_offsets[i]:self._cat_offsets[i + 1]]
+
+    def terms(self, i: int) -> list:
+        return [self.categories[c] for c in self.category_ids(i)]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# LOADING
+# ══════════════════════════════════════════════════════════════════════════════
+def read_papers(path: str = DATASET_PATH) -> PaperTable:
+    """Read the ArXiv CSV into a PaperTable; the row index doubles as the paper ID."""
+    papers = PaperTable()
+    parsed = {}   # the same few category lists repeat across most rows
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                raw = (row.get("terms") or "[]").strip()
+                if raw not in parsed:
+                    parsed[raw] = parse_terms(raw)
+                papers.append(
+                    (row.get("titles")    or "").strip(),
+                    (row.get("summaries") or "").strip(),
+                    parsed[raw],
+                )
+    except FileNotFoundError:
+        pass
+    return papers
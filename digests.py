@@ -0,0 +1,195 @@
+"""
+Offline per-paper digest precomputation.
+
+    python digests.py --source logs --limit 500 --workers 4
+    python digests.py --source corpus --limit 5000
+
+Digests are short LLM-written condensations of each abstract, stored in a
+SQLite key-value table next to the dataset. Re-running the job resumes where
+it stopped: papers that already have a digest are skipped.
+
+Digests are keyed by CSV row index, so the store records the dataset snapshot
+(row count and content hash) it was built from and is ignored for any other.
+"""
+import time
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from dataset import DATASET_PATH, artifact_path, dataset_fingerprint, read_papers
+
+DIGEST_MODEL = "llama3.2"
+
+DIGEST_SYSTEM = """You are ResearchMind AI — an expert academic summariser.
+
+Condense the given ArXiv abstract into a digest of at most 3 sentences (under 80 words):
+the problem addressed, the method, and the key result. Plain prose, no headings, no preamble.
+Only use what is in the abstract — do not hallucinate."""
+
+
+def digest_path(dataset_path: str = DATASET_PATH) -> str:
+    return artifact_path(dataset_path, ".digests.sqlite")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# DIGEST STORE
+# ══════════════════════════════════════════════════════════════════════════════
+class DigestStore:
+    """Compact paper_id -> digest table. Each digest is committed as soon as it is written."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS digests ("
+            " paper_id INTEGER PRIMARY KEY, digest TEXT NOT NULL,"
+            " model TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM digests").fetchone()[0]
+
+    def snapshot(self) -> dict:
+        """The dataset snapshot the digests were built from: n_papers and fingerprint."""
+        with self._lock:
+            meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        if "n_papers" not in meta:
+            return {}
+        return {"n_papers": int(meta["n_papers"]), "fingerprint": meta.get("fingerprint")}
+
+    def matches(self, papers) -> bool:
+        snapshot = self.snapshot()
+        return (snapshot.get("n_papers") == len(papers)
+                and snapshot.get("fingerprint") == dataset_fingerprint(papers))
+
+    def claim(self, papers):
+        """
+        Record `papers` as this store's snapshot. Raises ValueError if the store already
+        holds digests of another snapshot, or digests of an unknown one.
+        """
+        if self.matches(papers):
+            return
+        if self.snapshot() or len(self):
+            raise ValueError("digest store was built for a different dataset snapshot")
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [("n_papers", str(len(papers))), ("fingerprint", dataset_fingerprint(papers))],
+            )
+
+    def existing_ids(self) -> set:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT paper_id FROM digests")}
+
+    def get_many(self, paper_ids: list) -> dict:
+        if not paper_ids:
+            return {}
+        marks = ",".join("?" * len(paper_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT paper_id, digest FROM digests WHERE paper_id IN ({marks})",
+                list(paper_ids),
+            ).fetchall()
+        return dict(rows)
+
+    def put(self, paper_id: int, digest: str, model: str = DIGEST_MODEL):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO digests (paper_id, digest, model, created_at)"
+                " VALUES (?, ?, ?, ?)",
+                (paper_id, digest, model, time.time()),
+            )
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BATCH JOB
+# ══════════════════════════════════════════════════════════════════════════════
+def digest_paper(paper: dict, llm) -> str:
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    messages = [
+        SystemMessage(content=DIGEST_SYSTEM),
+        HumanMessage(content=f"Title: {paper['title']}\n\nAbstract: {paper['summary']}"),
+    ]
+    return llm.invoke(messages).content.strip()
+
+
+def build_digests(papers: list, paper_ids: list, store: DigestStore, llm,
+                  workers: int = 4, model: str = DIGEST_MODEL, log=print) -> int:
+    """
+    Digest the given papers with at most `workers` LLM calls in flight.
+    Already-digested papers are skipped, so an interrupted run resumes from its checkpoint.
+    Raises ValueError if the store holds digests of another dataset snapshot.
+    """
+    store.claim(papers)
+    done_ids = store.existing_ids()
+    todo     = [pid for pid in paper_ids if pid not in done_ids and pid < len(papers)]
+    log(f"{len(todo)} papers to digest ({len(paper_ids) - len(todo)} already done)")
+
+    written, failed = 0, 0
+    pending = {}
+    queue   = iter(todo)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            for pid in queue:
+                pending[pool.submit(digest_paper, papers[pid], llm)] = pid
+                if len(pending) >= workers:
+                    break
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                pid = pending.pop(fut)
+                try:
+                    store.put(pid, fut.result(), model)
+                    written += 1
+                except Exception as e:
+                    failed += 1
+                    log(f"⚠️ paper {pid} failed: {e}")
+                    continue
+                if written % 50 == 0:
+                    log(f"… {written}/{len(todo)} digests written")
+
+    log(f"Done: {written} written, {failed} failed, {len(store)} total in store")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute per-paper digests with the local LLM.")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--source", choices=["corpus", "logs"], default="logs",
+                        help="walk the whole corpus, or the most-retrieved papers in saved sessions")
+    parser.add_argument("--sessions-db", default=None, help="session database used with --source logs")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--model", default=DIGEST_MODEL)
+    args = parser.parse_args()
+
+    from langchain_ollama import ChatOllama
+    from session_store import SESSIONS_DB, SessionStore
+    from prompting import llm_options
+
+    papers = read_papers(args.dataset)
+    if not papers:
+        raise SystemExit(f"No papers found in {args.dataset}")
+
+    if args.source == "logs":
+        counts    = SessionStore(args.sessions_db or SESSIONS_DB).paper_retrieval_counts(args.limit)
+        paper_ids = [pid for pid, _ in counts]
+    else:
+        paper_ids = list(range(min(args.limit, len(papers))))
+
+    llm = ChatOllama(model=args.model, temperature=0.2, **llm_options())
+    out = digest_path(args.dataset)
+    try:
+        build_digests(papers, paper_ids, DigestStore(out), llm, workers=args.workers, model=args.model)
+    except ValueError as e:
+        raise SystemExit(f"{e}: delete {out} to rebuild it for {args.dataset}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_CACHE_SIZE = 32     # prepared results kept until used or evicted
+CPU_BUDGET_S        = 5.0    # prefetch CPU seconds allowed per budget window
+LLM_BUDGET          = 3      # speculative LLM drafts allowed per budget window
+BUDGET_WINDOW_S     = 300.0
+FOREGROUND_LEASE_S  = 120.0  # a job waits at most this long for user requests to finish
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PREFETCHER
+# ══════════════════════════════════════════════════════════════════════════════
+class Prefetcher:
+    """
+    Prepares likely next results (retrieval, PDFs, LLM drafts) on one background thread
+    while the user is reading, within a rolling CPU and LLM-call budget.
+
+    Results wait in a bounded LRU cache and are only handed out by `take` when the user
+    actually issues a matching request. One instance serves every browser session of
+    the process, so a job does not start while any of their requests is being served.
+    """
+
+    def __init__(self, cache_size: int = PREFETCH_CACHE_SIZE, cpu_budget_s: float = CPU_BUDGET_S,
+                 llm_budget: int = LLM_BUDGET, window_s: float = BUDGET_WINDOW_S,
+                 lease_s: float = FOREGROUND_LEASE_S):
+        self.cache_size   = cache_size
+        self.cpu_budget_s = cpu_budget_s
+        self.llm_budget   = llm_budget
+        self.window_s     = window_s
+        self.lease_s      = lease_s
+        self.hits         = 0
+        self.misses       = 0
+
+        self._cache      = OrderedDict()
+        self._pending    = set()
+        self._cpu_spent  = deque()   # (finished_at, cpu seconds)
+        self._llm_calls  = deque()   # started_at
+        self._foreground = 0         # user requests currently being served
+        self._lock       = threading.Lock()
+        self._pool       = ThreadPoolExecutor(max_workers=1, thread_name_prefix="researchmind-prefetch")
+
+    # ── Foreground coordination ──
+    def foreground(self):
+        """A user request is being served: hold off starting new prefetch jobs."""
+        with self._lock:
+            self._foreground += 1
+
+    def idle(self):
+        """The request that called foreground() is done; call it exactly once, from a finally."""
+        with self._lock:
+            self._foreground = max(0, self._foreground - 1)
+
+    @property
+    def busy(self) -> bool:
+        return self._foreground > 0
+
+    # ── Budgets ──
+    def _trim(self, now: float):
+        while self._cpu_spent and now - self._cpu_spent[0][0] > self.window_s:
+            self._cpu_spent.popleft()
+        while self._llm_calls and now - self._llm_calls[0] > self.window_s:
+            self._llm_calls.popleft()
+
+    def _within_budget(self, llm: bool) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            if sum(cpu for _, cpu in self._cpu_spent) >= self.cpu_budget_s:
+                return False
+            if llm:
+                if len(self._llm_calls) >= self.llm_budget:
+                    return False
+                self._llm_calls.append(now)
+        return True
+
+    # ── Jobs ──
+    def submit(self, key, fn, llm: bool = False) -> bool:
+        """Queue `fn()` to prepare the result for `key`. Returns False if skipped."""
+        with self._lock:
+            if key in self._cache or key in self._pending:
+                return False
+            self._pending.add(key)
+        self._pool.submit(self._run, key, fn, llm)
+        return True
+
+    def _run(self, key, fn, llm: bool):
+        try:
+            # The lease only guards against a request that never calls idle()
+            deadline = time.monotonic() + self.lease_s
+            while self.busy and time.monotonic() < deadline:
+                time.sleep(0.2)
+            if not self._within_budget(llm):
+                return
+            cpu_start = time.thread_time()
+            try:
+                result = fn()
+            except Exception as e:
+                logger.warning("%s prefetch failed: %s", key[0], e)
+                return
+            finally:
+                with self._lock:
+                    self._cpu_spent.append((time.monotonic(), time.thread_time() - cpu_start))
+            with self._lock:
+                self._cache[key] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def take(self, key):
+        """The prepared result for `key` (removed from the cache), or None."""
+        with self._lock:
+            result = self._cache.pop(key, None)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
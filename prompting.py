@@ -0,0 +1,67 @@
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every client of the model must agree on these: Ollama reloads the model (and drops its
+# KV cache) whenever num_ctx changes, and unloads it after keep_alive of inactivity.
+LLM_NUM_CTX    = 8192
+LLM_KEEP_ALIVE = "30m"
+
+
+def llm_options() -> dict:
+    return {"num_ctx": LLM_NUM_CTX, "keep_alive": LLM_KEEP_ALIVE}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PROMPT ASSEMBLY
+# ══════════════════════════════════════════════════════════════════════════════
+def build_chat_messages(system: str, history: list, query: str, context: str = "",
+                        instructions: str = "") -> list:
+    """
+    Order the prompt from most to least stable so consecutive turns share a prefix
+    Ollama can reuse from its KV cache:
+
+        fixed system instructions → prior turns, replayed verbatim
+            → this question + this turn's answer instructions + its papers
+
+    `system` must be the same for every turn of a conversation: anything that depends
+    on the kind of turn (answer structure, retrieved context) only ever rides on the
+    newest user message. Past turns are replayed as the plain question the user typed,
+    so the replayed history never changes.
+    """
+    from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+
+    messages = [SystemMessage(content=system)]
+    for m in history:
+        if m["role"] == "user":
+            messages.append(HumanMessage(content=m["content"]))
+        else:
+            messages.append(AIMessage(content=m["content"]))
+    messages.append(HumanMessage(content="\n\n".join(part for part in (query, instructions, context) if part)))
+    return messages
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# TURN STATS
+# ══════════════════════════════════════════════════════════════════════════════
+def invoke_with_stats(llm, messages: list):
+    """Invoke the model and return (text, stats) with Ollama's prefill/decode timings."""
+    started  = time.perf_counter()
+    response = llm.invoke(messages)
+    meta     = getattr(response, "response_metadata", None) or {}
+
+    stats = {
+        "wall_ms":       (time.perf_counter() - started) * 1000,
+        "prompt_tokens": meta.get("prompt_eval_count", 0),
+        "prefill_ms":    meta.get("prompt_eval_duration", 0) / 1e6,
+        "output_tokens": meta.get("eval_count", 0),
+        "decode_ms":     meta.get("eval_duration", 0) / 1e6,
+        "load_ms":       meta.get("load_duration", 0) / 1e6,
+    }
+    logger.debug(
+        "prefill %d tok in %.0f ms · decode %d tok in %.0f ms · load %.0f ms · wall %.0f ms",
+        stats["prompt_tokens"], stats["prefill_ms"], stats["output_tokens"], stats["decode_ms"],
+        stats["load_ms"], stats["wall_ms"],
+    )
+    return response.content, stats
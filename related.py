@@ -0,0 +1,239 @@
+"""
+Offline paper-to-paper similarity graph for "more like this".
+
+    python related.py --k 10
+    python related.py --k 20 --max-features 100000 --block-cells 33554432
+
+Every paper gets its k nearest neighbours by cosine similarity of TF-IDF vectors
+built from the search index's postings. Similarities are computed block by block,
+one sparse x sparse product per block of rows, so memory stays bounded by
+--block-cells however large the corpus. The graph is stored as CSR arrays in
+arxiv_data.related/ and memory-mapped by the app, so a lookup is two array reads.
+"""
+import os
+import json
+import mmap
+import time
+import heapq
+import argparse
+
+from dataset import DATASET_PATH, artifact_path, read_papers
+from search_index import PositionalIndex, STOP_WORDS
+
+RELATED_K           = 10
+MAX_FEATURES        = 50_000   # most frequent informative terms kept as features
+MIN_DF              = 2        # terms in fewer papers cannot link two papers
+MAX_DF              = 0.3      # terms in more than this fraction of papers carry no signal
+BLOCK_CELLS         = 1 << 24  # paper x paper similarity cells per block (~64 MB)
+NEIGHBOUR_MIN_SCORE = 0.15     # weaker links are not worth adding to LLM context
+
+
+def related_path(dataset_path: str = DATASET_PATH) -> str:
+    return artifact_path(dataset_path, ".related")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# FEATURES
+# ══════════════════════════════════════════════════════════════════════════════
+def tfidf_features(index: PositionalIndex, max_features: int = MAX_FEATURES,
+                   min_df: int = MIN_DF, max_df: float = MAX_DF):
+    """
+    L2-normalised TF-IDF matrix (papers x terms, scipy CSR, float32) and its vocabulary.
+    Term frequencies come straight from the index's posting offsets, so nothing is
+    re-tokenised.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    n_docs = len(index)
+    df     = {t: len(entry[0]) for t, entry in index.postings.items()}
+    kept   = [t for t, d in df.items()
+              if min_df <= d <= max_df * n_docs and len(t) >= 3
+              and t not in STOP_WORDS and not t.isdigit()]
+    vocab  = sorted(heapq.nlargest(max_features, kept, key=lambda t: (df[t], t)))
+
+    rows, cols, vals = [], [], []
+    for col, term in enumerate(vocab):
+        docs, offsets, _ = index.postings[term]
+        tf = np.diff(np.frombuffer(offsets, dtype=np.uint32)).astype(np.float32)
+        rows.append(np.frombuffer(docs, dtype=np.uint32))
+        cols.append(np.full(len(docs), col, dtype=np.int32))
+        vals.append((1 + np.log(tf)) * np.float32(np.log(n_docs / df[term])))
+
+    if not vocab:
+        return sparse.csr_matrix((n_docs, 0), dtype=np.float32), vocab
+    X = sparse.csr_matrix(
+        (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(n_docs, len(vocab)), dtype=np.float32,
+    )
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).astype(np.float32) @ X, vocab
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BUILD
+# ══════════════════════════════════════════════════════════════════════════════
+def knn_graph(X, k: int = RELATED_K, block_cells: int = BLOCK_CELLS, log=print):
+    """
+    Top-k cosine neighbours of every row of X, as CSR arrays (indptr, indices, scores)
+    with each row's neighbours in descending similarity. Papers sharing no feature
+    term are never neighbours, so some rows hold fewer than k entries.
+    """
+    import numpy as np
+
+    n_docs = X.shape[0]
+    k      = min(k, max(n_docs - 1, 0))
+    XT     = X.T.tocsc()
+    block  = max(1, block_cells // max(n_docs, 1))
+
+    counts  = np.zeros(n_docs, dtype=np.uint32)
+    indices = []
+    scores  = []
+    started = time.perf_counter()
+    for start in range(0, n_docs if k else 0, block):
+        stop = min(start + block, n_docs)
+        sims = (X[start:stop] @ XT).toarray()
+        sims[np.arange(stop - start), np.arange(start, stop)] = 0   # a paper is not its own neighbour
+
+        top  = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        best = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-best, axis=1, kind="stable")
+        top   = np.take_along_axis(top, order, axis=1)
+        best  = np.take_along_axis(best, order, axis=1)
+
+        linked = best > 0
+        counts[start:stop] = linked.sum(axis=1)
+        indices.append(top[linked].astype(np.uint32))
+        scores.append(best[linked].astype(np.float32))
+        if (start // block) % 20 == 0:
+            log(f"… {stop:,}/{n_docs:,} papers ({time.perf_counter() - started:.1f} s)")
+
+    indptr = np.zeros(n_docs + 1, dtype=np.uint32)
+    np.cumsum(counts, out=indptr[1:])
+    return (indptr,
+            np.concatenate(indices) if indices else np.zeros(0, dtype=np.uint32),
+            np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32))
+
+
+def save_graph(path: str, indptr, indices, scores, meta: dict):
+    """Write the CSR arrays as raw native-endian files; meta.json goes last and marks completion."""
+    os.makedirs(path, exist_ok=True)
+    for name, arr in (("indptr.bin", indptr), ("indices.bin", indices), ("scores.bin", scores)):
+        tmp = os.path.join(path, name + ".tmp")
+        arr.tofile(tmp)
+        os.replace(tmp, os.path.join(path, name))
+    with open(os.path.join(path, "meta.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(os.path.join(path, "meta.json.tmp"), os.path.join(path, "meta.json"))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# LOOKUP
+# ══════════════════════════════════════════════════════════════════════════════
+class RelatedGraph:
+    """
+    Read-only, memory-mapped view of a saved graph. Only the pages actually touched
+    are read from disk, and lookups need neither numpy nor a copy of the arrays.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self._maps   = []
+        self.indptr  = self._map(path, "indptr.bin", "I")
+        self.indices = self._map(path, "indices.bin", "I")
+        self.scores  = self._map(path, "scores.bin", "f")
+
+    def _map(self, path: str, name: str, fmt: str) -> memoryview:
+        with open(os.path.join(path, name), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"").cast(fmt)
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mm)
+        return memoryview(mm).cast(fmt)
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def neighbours(self, paper_id: int, k: int = None) -> list:
+        """[(paper_id, cosine similarity)] of the closest papers, best first."""
+        if not 0 <= paper_id < len(self):
+            return []
+        lo, hi = self.indptr[paper_id], self.indptr[paper_id + 1]
+        if k is not None:
+            hi = min(hi, lo + k)
+        return list(zip(self.indices[lo:hi].tolist(), self.scores[lo:hi].tolist()))
+
+
+def load_graph(path: str, n_papers: int):
+    """The saved graph, or None if it is missing or was built for a different snapshot."""
+    try:
+        graph = RelatedGraph(path)
+    except (FileNotFoundError, ValueError):
+        return None
+    return graph if len(graph) == n_papers else None
+
+
+def expand_with_neighbours(papers: list, graph: RelatedGraph, corpus: list,
+                           limit: int = 3, min_score: float = NEIGHBOUR_MIN_SCORE) -> list:
+    """
+    Up to `limit` extra papers close to the given ones: every paper's best neighbour
+    first, then every paper's second best, and so on. No extra retrieval pass.
+    """
+    if graph is None or not papers:
+        return []
+    seen  = {p["id"] for p in papers}
+    lists = [graph.neighbours(p["id"]) for p in papers]
+    extra = []
+    for rank in range(max(map(len, lists))):
+        for neighbours in lists:
+            if rank < len(neighbours):
+                nid, score = neighbours[rank]
+                if score >= min_score and nid not in seen:
+                    seen.add(nid)
+                    extra.append(corpus[nid])
+                    if len(extra) >= limit:
+                        return extra
+    return extra
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the paper-to-paper kNN graph.")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--k", type=int, default=RELATED_K)
+    parser.add_argument("--max-features", type=int, default=MAX_FEATURES)
+    parser.add_argument("--min-df", type=int, default=MIN_DF)
+    parser.add_argument("--max-df", type=float, default=MAX_DF)
+    parser.add_argument("--block-cells", type=int, default=BLOCK_CELLS)
+    args = parser.parse_args()
+
+    try:
+        import numpy  # noqa: F401
+        import scipy  # noqa: F401
+    except ImportError:
+        raise SystemExit("Building the graph requires numpy and scipy. Install with: pip install numpy scipy")
+
+    started = time.perf_counter()
+    papers  = read_papers(args.dataset)
+    if not papers:
+        raise SystemExit(f"No papers found in {args.dataset}")
+    index = PositionalIndex(papers)
+    X, vocab = tfidf_features(index, args.max_features, args.min_df, args.max_df)
+    print(f"{len(papers):,} papers x {len(vocab):,} features, {X.nnz:,} non-zeros "
+          f"({time.perf_counter() - started:.1f} s)")
+
+    indptr, indices, scores = knn_graph(X, args.k, args.block_cells)
+    out = related_path(args.dataset)
+    save_graph(out, indptr, indices, scores, {
+        "n_papers": len(papers),
+        "k":        args.k,
+        "features": len(vocab),
+        "edges":    int(len(indices)),
+        "built_at": time.time(),
+    })
+    print(f"Done: {len(indices):,} edges written to {out}/ in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+"""
+PDF reports: the single-answer PDF offered in chat, and bulk multi-topic exports.
+
+    python report.py --topics "graph neural networks" "vision transformers" --out reading_list.pdf
+    python report.py --topics-file topics.txt --papers-per-topic 10 --workers 4
+    python report.py --session <session id> --out session_report.pdf
+
+Bulk exports render each section in its own worker process straight to a temporary
+file, then merge the sections behind a contents page with one bookmark per topic.
+The merge streams: each section file is read and its pages written to the output
+before the next is opened, so memory does not grow with the report.
+"""
+import os
+import re
+import argparse
+import datetime
+import tempfile
+from io import BytesIO
+from xml.sax.saxutils import escape
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from dataset import DATASET_PATH, parse_terms
+
+FOOTER = "Generated by ResearchMind AI — LLM-Based Multi-Agent Academic Research System"
+
+JOBS_PER_WORKER = 2   # sections queued or rendering per worker process
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# STORY BUILDING
+# ══════════════════════════════════════════════════════════════════════════════
+def _styles() -> dict:
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+
+    styles   = getSampleStyleSheet()
+    clr_blue = colors.HexColor('#1a73e8')
+    clr_grey = colors.HexColor('#5f6368')
+
+    return {
+        "blue": clr_blue,
+        "div":  colors.HexColor('#dadce0'),
+        "title": ParagraphStyle(
+            'RMTitle', parent=styles['Title'],
+            fontSize=22, textColor=clr_blue,
+            spaceAfter=6, alignment=TA_CENTER
+        ),
+        "subtitle": ParagraphStyle(
+            'RMSub', parent=styles['Normal'],
+            fontSize=12, textColor=clr_blue,
+            spaceAfter=4, alignment=TA_CENTER,
+            fontName='Helvetica-BoldOblique'
+        ),
+        "meta": ParagraphStyle(
+            'RMMeta', parent=styles['Normal'],
+            fontSize=10, textColor=clr_grey,
+            alignment=TA_CENTER, spaceAfter=16
+        ),
+        "h2": ParagraphStyle(
+            'RMH2', parent=styles['Heading2'],
+            fontSize=14, textColor=clr_blue,
+            spaceBefore=18, spaceAfter=6
+        ),
+        "h3": ParagraphStyle(
+            'RMH3', parent=styles['Heading3'],
+            fontSize=12, textColor=colors.HexColor('#34a853'),
+            spaceBefore=12, spaceAfter=4
+        ),
+        "body": ParagraphStyle(
+            'RMBody', parent=styles['Normal'],
+            fontSize=11, leading=18, spaceAfter=8
+        ),
+        "bullet": ParagraphStyle(
+            'RMBullet', parent=styles['Normal'],
+            fontSize=11, leading=18, spaceAfter=6, leftIndent=16
+        ),
+        "small": ParagraphStyle(
+            'RMSmall', parent=styles['Normal'],
+            fontSize=9, textColor=clr_grey, leading=14, spaceAfter=6
+        ),
+    }
+
+
+def _new_doc(target):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate
+
+    return SimpleDocTemplate(
+        target, pagesize=A4,
+        leftMargin=2.5*cm, rightMargin=2.5*cm,
+        topMargin=2.5*cm,  bottomMargin=2.5*cm
+    )
+
+
+def _markup(line: str) -> str:
+    """Escape raw text for ReportLab's paragraph parser, then map **bold** / *italic*."""
+    clean = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', escape(line))
+    return re.sub(r'\*(.*?)\*', r'<i>\1</i>', clean)
+
+
+def _build_story(title: str, content: str, paper_meta: list, s: dict,
+                 subtitle: str = "ArXiv Research Summary Report") -> list:
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, Spacer, HRFlowable
+
+    story = []
+
+    # ── Cover block ──
+    story.append(Spacer(1, 0.5*cm))
+    story.append(Paragraph("ResearchMind AI", s["title"]))
+    story.append(Paragraph(escape(subtitle), s["subtitle"]))
+    story.append(Spacer(1, 0.3*cm))
+    story.append(Paragraph(f"<b>Topic:</b> {escape(title)}", s["meta"]))
+    story.append(Paragraph(
+        f"Generated: {datetime.datetime.now().strftime('%B %d, %Y  %H:%M')}",
+        s["meta"]
+    ))
+    story.append(HRFlowable(width="100%", thickness=1.5, color=s["blue"]))
+    story.append(Spacer(1, 0.4*cm))
+
+    # ── Main content ──
+    for line in content.split('\n'):
+        line = line.strip()
+        if not line:
+            story.append(Spacer(1, 0.18*cm))
+            continue
+        if line.startswith('### '):
+            story.append(Paragraph(escape(line[4:].strip()), s["h3"]))
+        elif line.startswith('## ') or line.startswith('# '):
+            story.append(Paragraph(escape(line.lstrip('#').strip()), s["h2"]))
+        elif line.startswith('- ') or line.startswith('* '):
+            story.append(Paragraph(f"• {_markup(line[2:])}", s["bullet"]))
+        elif re.match(r'^\d+\.\s', line):
+            story.append(Paragraph(_markup(line), s["bullet"]))
+        else:
+            story.append(Paragraph(_markup(line), s["body"]))
+
+    # ── Appendix: full paper abstracts ──
+    if paper_meta:
+        story.append(Spacer(1, 0.6*cm))
+        story.append(HRFlowable(width="100%", thickness=1, color=s["div"]))
+        story.append(Spacer(1, 0.2*cm))
+        story.append(Paragraph("Appendix — Retrieved ArXiv Papers", s["h2"]))
+        story.append(Spacer(1, 0.2*cm))
+        for idx, p in enumerate(paper_meta, 1):
+            terms = parse_terms(p["terms"])
+            story.append(Paragraph(f"{idx}. {escape(p['title'])}", s["h3"]))
+            story.append(Paragraph(
+                f"<b>Categories:</b> {escape(', '.join(terms))}", s["small"]
+            ))
+            story.append(Paragraph(
+                escape(p["summary"].replace('\n', ' ')), s["small"]
+            ))
+            story.append(Spacer(1, 0.2*cm))
+
+    # ── Footer ──
+    story.append(Spacer(1, 0.5*cm))
+    story.append(HRFlowable(width="100%", thickness=0.5, color=s["div"]))
+    story.append(Paragraph(FOOTER, s["meta"]))
+    return story
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SINGLE REPORT
+# ══════════════════════════════════════════════════════════════════════════════
+def generate_pdf(title: str, content: str, paper_meta: list = None) -> bytes:
+    """
+    Generate a formatted A4 PDF from the AI response content.
+    paper_meta: optional list of paper dicts appended as an Appendix section.
+    """
+    try:
+        buf = BytesIO()
+        doc = _new_doc(buf)
+        doc.build(_build_story(title, content, paper_meta, _styles()))
+        return buf.getvalue()
+
+    except ImportError:
+        return b""
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BULK EXPORT
+# ══════════════════════════════════════════════════════════════════════════════
+def _plain_paper(p) -> dict:
+    """Picklable copy of the fields the PDF needs, for sending to worker processes."""
+    return {"title": p["title"], "summary": p["summary"], "terms": p["terms"]}
+
+
+def render_section(job: tuple) -> tuple:
+    """
+    Worker: render one section straight to `path`. Returns (path, page count, error).
+    A section that fails to render becomes a one-page placeholder, so one bad abstract
+    cannot abort the whole export.
+    """
+    path, number, total, section = job
+    subtitle = f"Section {number} of {total}"
+    try:
+        doc = _new_doc(path)
+        doc.build(_build_story(
+            section["title"], section["content"], section["papers"], _styles(), subtitle=subtitle,
+        ))
+        return path, doc.page, None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        doc = _new_doc(path)
+        doc.build(_build_story(
+            section["title"], f"This section could not be rendered.\n\n{error}", None, _styles(),
+            subtitle=subtitle,
+        ))
+        return path, doc.page, error
+
+
+def _section_jobs(sections: list, tmp: str):
+    """Worker payloads, built one at a time as they are submitted."""
+    for n, sec in enumerate(sections, 1):
+        yield (os.path.join(tmp, f"section_{n:04d}.pdf"), n, len(sections),
+               {**sec, "papers": [_plain_paper(p) for p in sec.get("papers") or []]})
+
+
+def _render_contents(path: str, report_title: str, entries: list, first_page: int) -> int:
+    """Cover + contents page listing each section's starting page. Returns its page count."""
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, Spacer, HRFlowable
+
+    s = _styles()
+    story = [
+        Spacer(1, 0.5*cm),
+        Paragraph("ResearchMind AI", s["title"]),
+        Paragraph(escape(report_title), s["subtitle"]),
+        Paragraph(
+            f"{len(entries)} topics · Generated: "
+            f"{datetime.datetime.now().strftime('%B %d, %Y  %H:%M')}",
+            s["meta"]
+        ),
+        HRFlowable(width="100%", thickness=1.5, color=s["blue"]),
+        Paragraph("Contents", s["h2"]),
+    ]
+    page = first_page
+    for number, (title, pages) in enumerate(entries, 1):
+        story.append(Paragraph(f"{number}. {escape(title)} ........ p. {page}", s["bullet"]))
+        page += pages
+    doc = _new_doc(path)
+    doc.build(story)
+    return doc.page
+
+
+class PdfConcatenator:
+    """
+    Writes the pages of whole PDF files to `out` one file at a time. Each file's pages,
+    and every object they reference, are renumbered and written as soon as it is read,
+    so memory holds one input file plus a byte offset per written object. close()
+    adds the page tree, one bookmark per appended file, the xref table and the trailer.
+    """
+
+    PAGE_TREE = 1   # object number reserved for the page tree, written by close()
+
+    def __init__(self, out):
+        self.out       = out
+        self.offsets   = [None, None]   # object number -> byte offset in `out`
+        self.pages     = []             # object numbers of the output pages
+        self.bookmarks = []             # (title, first page's object number)
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _reserve(self) -> int:
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+
+    def _write(self, number: int, obj):
+        self.offsets[number] = self.out.tell()
+        self.out.write(f"{number} 0 obj\n".encode())
+        obj.write_to_stream(self.out)
+        self.out.write(b"\nendobj\n")
+
+    def append(self, path: str, title: str = None):
+        from pypdf import PdfReader
+        from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject
+
+        reader  = PdfReader(path)
+        numbers = {}   # (idnum, generation) in `path` -> object number in `out`
+        queue   = []
+
+        def renumber(ref) -> IndirectObject:
+            key = (ref.idnum, ref.generation)
+            if key not in numbers:
+                numbers[key] = self._reserve()
+                queue.append((numbers[key], ref.get_object()))
+            return IndirectObject(numbers[key], 0, None)
+
+        def relink(obj):
+            """Point every reference inside `obj` (in place) at its output object number."""
+            if isinstance(obj, IndirectObject):
+                return renumber(obj)
+            if isinstance(obj, DictionaryObject):
+                for key, value in obj.items():
+                    obj[key] = relink(value)
+            elif isinstance(obj, ArrayObject):
+                for i, value in enumerate(obj):
+                    obj[i] = relink(value)
+            return obj
+
+        # pypdf resolves inherited attributes (/Resources, /MediaBox, ...) onto each page,
+        # so the old page tree can be dropped and the pages re-parented
+        pages = set()
+        for page in reader.pages:
+            del page["/Parent"]
+            number = self._reserve()
+            numbers[(page.indirect_reference.idnum, page.indirect_reference.generation)] = number
+            queue.append((number, page))
+            pages.add(number)
+            self.pages.append(number)
+        if title is not None and pages:
+            self.bookmarks.append((title, min(pages)))
+
+        while queue:
+            number, obj = queue.pop()
+            obj = relink(obj)
+            if number in pages:
+                obj[NameObject("/Parent")] = IndirectObject(self.PAGE_TREE, 0, None)
+            self._write(number, obj)
+
+    def close(self):
+        """Write the page tree, bookmarks, catalog, xref table and trailer."""
+        from pypdf.generic import (ArrayObject, DictionaryObject, IndirectObject, NameObject,
+                                   NumberObject, TextStringObject)
+
+        def ref(number: int) -> IndirectObject:
+            return IndirectObject(number, 0, None)
+
+        self._write(self.PAGE_TREE, DictionaryObject({
+            NameObject("/Type"):  NameObject("/Pages"),
+            NameObject("/Kids"):  ArrayObject(ref(n) for n in self.pages),
+            NameObject("/Count"): NumberObject(len(self.pages)),
+        }))
+
+        catalog = DictionaryObject({
+            NameObject("/Type"):  NameObject("/Catalog"),
+            NameObject("/Pages"): ref(self.PAGE_TREE),
+        })
+        if self.bookmarks:
+            outlines = self._reserve()
+            items    = [self._reserve() for _ in self.bookmarks]
+            for i, ((title, page), number) in enumerate(zip(self.bookmarks, items)):
+                item = DictionaryObject({
+                    NameObject("/Title"):  TextStringObject(title),
+                    NameObject("/Parent"): ref(outlines),
+                    NameObject("/Dest"):   ArrayObject([ref(page), NameObject("/Fit")]),
+                })
+                if i > 0:
+                    item[NameObject("/Prev")] = ref(items[i - 1])
+                if i + 1 < len(items):
+                    item[NameObject("/Next")] = ref(items[i + 1])
+                self._write(number, item)
+            self._write(outlines, DictionaryObject({
+                NameObject("/Type"):  NameObject("/Outlines"),
+                NameObject("/First"): ref(items[0]),
+                NameObject("/Last"):  ref(items[-1]),
+                NameObject("/Count"): NumberObject(len(items)),
+            }))
+            catalog[NameObject("/Outlines")] = ref(outlines)
+            catalog[NameObject("/PageMode")] = NameObject("/UseOutlines")
+        root = self._reserve()
+        self._write(root, catalog)
+
+        xref = self.out.tell()
+        self.out.write(f"xref\n0 {len(self.offsets)}\n0000000000 65535 f \n".encode())
+        for offset in self.offsets[1:]:
+            self.out.write(f"{offset:010d} 00000 n \n".encode())
+        self.out.write(f"trailer\n<< /Size {len(self.offsets)} /Root {root} 0 R >>\n"
+                       f"startxref\n{xref}\n%%EOF\n".encode())
+
+
+def export_bulk_report(sections: list, out_path: str, title: str = "ArXiv Reading List",
+                       workers: int = 4, log=print) -> str:
+    """
+    Write a multi-topic report to `out_path`.
+
+    sections: list of {"title", "content", "papers"} dicts. Each is rendered to its
+    own temporary PDF in a process pool, with at most JOBS_PER_WORKER sections per
+    worker queued at once, so no process holds more than a few sections' stories.
+    The merge then streams their pages into `out_path` one section file at a time.
+    """
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Bulk export requires `pypdf`. Install with: pip install pypdf")
+
+    with tempfile.TemporaryDirectory(prefix="researchmind_export_") as tmp:
+        paths       = [os.path.join(tmp, f"section_{n:04d}.pdf") for n in range(1, len(sections) + 1)]
+        page_counts = [0] * len(sections)
+        done        = 0
+        jobs        = _section_jobs(sections, tmp)
+        pending     = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                for job in jobs:
+                    pending[pool.submit(render_section, job)] = job[1]
+                    if len(pending) >= workers * JOBS_PER_WORKER:
+                        break
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    number = pending.pop(fut)
+                    _, page_counts[number - 1], error = fut.result()
+                    done += 1
+                    if error:
+                        log(f"⚠️ section {number}/{len(sections)} replaced by a placeholder: {error}")
+                    else:
+                        log(f"… section {number}/{len(sections)} rendered "
+                            f"({page_counts[number - 1]} pages, {done} done)")
+
+        # The contents page count shifts every section's first page, so settle it first
+        entries = [(sec["title"], pages) for sec, pages in zip(sections, page_counts)]
+        contents_path = os.path.join(tmp, "contents.pdf")
+        contents_pages, prev = 1, None
+        while contents_pages != prev:
+            prev = contents_pages
+            contents_pages = _render_contents(contents_path, title, entries, contents_pages + 1)
+
+        with open(out_path, "wb") as f:
+            merged = PdfConcatenator(f)
+            merged.append(contents_path)
+            for sec, path in zip(sections, paths):
+                merged.append(path, title=sec["title"])
+            merged.close()
+
+    log(f"Wrote {out_path}: {len(sections)} sections, {contents_pages + sum(page_counts)} pages")
+    return out_path
+
+
+# ── Section sources ──
+def sections_from_topics(topics: list, index, papers_per_topic: int = 10,
+                         digest_store=None) -> list:
+    """One reading-list section per topic; papers come from a single batched search."""
+    from search_index import search_papers_batch
+
+    sections = []
+    for topic, found in zip(topics, search_papers_batch(topics, index, top_k=papers_per_topic)):
+        digests = digest_store.get_many([p["id"] for p in found]) if digest_store else {}
+        lines = [f"## Reading list: {topic}", ""]
+        for i, p in enumerate(found, 1):
+            blurb = digests.get(p["id"]) or p["summary"][:300].replace('\n', ' ') + "..."
+            lines.append(f"{i}. **{p['title']}** — {blurb}")
+        if not found:
+            lines.append("No matching papers found in the dataset.")
+        sections.append({"title": topic, "content": "\n".join(lines), "papers": found})
+    return sections
+
+
+def sections_from_session(store, owner: str, session_id: str, papers: list) -> list:
+    """One section per research answer in a saved chat session."""
+    messages = store.load_messages(owner, session_id, papers)
+    return [
+        {"title": prev["content"], "content": msg["content"], "papers": msg["retrieved_papers"]}
+        for prev, msg in zip(messages, messages[1:])
+        if msg["role"] == "assistant" and msg.get("research")
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a multi-topic ArXiv reading-list PDF.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--topics", nargs="+")
+    source.add_argument("--topics-file", help="one topic per line")
+    source.add_argument("--session", help="ID of a saved chat session")
+    parser.add_argument("--client", help="owner key of --session (the ?client= value in the app URL)")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--out", default="reading_list.pdf")
+    parser.add_argument("--title", default="ArXiv Reading List")
+    parser.add_argument("--papers-per-topic", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args()
+    if args.session and not args.client:
+        parser.error("--session requires --client")
+
+    from dataset import read_papers
+
+    papers = read_papers(args.dataset)
+    if args.session:
+        from session_store import SessionStore
+        sections = sections_from_session(SessionStore(), args.client, args.session, papers)
+    else:
+        from search_index import PositionalIndex
+        from digests import DigestStore, digest_path
+
+        topics = args.topics
+        if args.topics_file:
+            with open(args.topics_file, encoding="utf-8") as f:
+                topics = [line.strip() for line in f if line.strip()]
+        digest_store = None
+        if os.path.exists(digest_path(args.dataset)):
+            digest_store = DigestStore(digest_path(args.dataset))
+            if not digest_store.matches(papers):
+                print(f"⚠️ ignoring {digest_path(args.dataset)}: built for a different dataset snapshot")
+                digest_store = None
+        sections = sections_from_topics(topics, PositionalIndex(papers),
+                                        args.papers_per_topic, digest_store)
+
+    if not sections:
+        raise SystemExit("Nothing to export.")
+    export_bulk_report(sections, args.out, title=args.title, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,583 @@
+import re
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from itertools import compress
+
+from dataset import parse_terms
+
+TOKEN_RE      = re.compile(r'\w+')
+QUERY_WORD_RE = re.compile(r'\b\w{3,}\b')
+PHRASE_RE     = re.compile(r'"([^"]+)"')
+
+STOP_WORDS = {'the','and','for','that','this','with','are','from','have',
+              'what','how','does','explain','tell','me','about','please'}
+
+CATEGORY_MAP = {
+    "Machine Learning": ["cs.LG", "stat.ML"],
+    "Computer Vision":  ["cs.CV"],
+    "NLP":              ["cs.CL", "cs.IR"],
+    "Robotics":         ["cs.RO"],
+    "AI":               ["cs.AI"],
+    "Systems":          ["cs.DC", "cs.OS", "cs.NI"],
+}
+
+TITLE_BONUS      = 5   # per query term found in the title
+PHRASE_BONUS     = 8   # per occurrence of a quoted phrase
+PROXIMITY_WEIGHT = 3   # scaled by how tightly the query terms cluster
+
+FACET_CACHE_SIZE = 64  # scored candidate sets kept for chip switches / repeat queries
+BISECT_RATIO     = 10  # postings this many times longer than the allowed docs are bisected, not walked
+
+BATCH_BLOCK_CELLS = 1 << 24  # query x doc cells per dense batch block (~80 MB with match counts)
+BATCH_RERANK      = 4        # initial per-query pool (x top_k) re-scored with proximity
+
+
+def normalize(token: str) -> str:
+    """Fold simple plurals so 'networks' and 'network' share a posting list."""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list:
+    return [normalize(t) for t in TOKEN_RE.findall(text.lower())]
+
+
+def parse_query(query: str):
+    """Split a query into quoted phrases (token lists) and free query terms."""
+    phrases = [tokenize(p) for p in PHRASE_RE.findall(query)]
+    phrases = [p for p in phrases if p]
+    words   = set(QUERY_WORD_RE.findall(PHRASE_RE.sub(" ", query).lower())) - STOP_WORDS
+    terms   = {normalize(w) for w in words}
+    for phrase in phrases:
+        terms.update(t for t in phrase if len(t) >= 3 and t not in STOP_WORDS)
+    return phrases, sorted(terms)
+
+
+def min_span(positions_by_term: list) -> int:
+    """Length of the shortest window containing at least one position of every term."""
+    merged = sorted((pos, t) for t, positions in enumerate(positions_by_term) for pos in positions)
+    need   = len(positions_by_term)
+    counts = [0] * need
+    have, best, left = 0, None, 0
+    for right, (pos, t) in enumerate(merged):
+        if counts[t] == 0:
+            have += 1
+        counts[t] += 1
+        while have == need:
+            span = pos - merged[left][0] + 1
+            if best is None or span < best:
+                best = span
+            lt = merged[left][1]
+            counts[lt] -= 1
+            if counts[lt] == 0:
+                have -= 1
+            left += 1
+    return best or 0
+
+
+def to_bitset(doc_ids, n_docs: int) -> int:
+    """Pack doc IDs into an int bitset (bit d set for each doc d)."""
+    buf = bytearray((n_docs + 7) // 8)
+    for d in doc_ids:
+        buf[d >> 3] |= 1 << (d & 7)
+    return int.from_bytes(buf, "little")
+
+
+def bisect_hits(docs, allowed) -> list:
+    """Indices into sorted `docs` of the entries in sorted `allowed`, bisecting forward."""
+    hits, lo, n = [], 0, len(docs)
+    for doc in allowed:
+        lo = bisect_left(docs, doc, lo)
+        if lo == n:
+            break
+        if docs[lo] == doc:
+            hits.append(lo)
+    return hits
+
+
+def trigrams(term: str) -> set:
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Edit distance counting adjacent transpositions as one edit ("grpah" -> "graph").
+    Gives up with limit + 1 once every cell in a row exceeds `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, prev = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if before and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            cur.append(cost)
+        if min(cur) > limit:
+            return limit + 1
+        before, prev = prev, cur
+    return prev[-1]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# TRIGRAM VOCABULARY INDEX
+# ══════════════════════════════════════════════════════════════════════════════
+class TrigramIndex:
+    """
+    Character-trigram index over the corpus vocabulary for spelling correction.
+
+    Term IDs are assigned in order of term length, so each trigram's posting array is
+    length-sorted and the candidates within the allowed length band are one bisect away.
+    """
+
+    SHORTLIST  = 64  # candidates verified with the exact edit distance
+    SCAN_RATIO = 8   # scan a common gram's list outright if under this many x the candidates
+
+    def __init__(self, doc_freqs: dict):
+        self.terms = sorted((t for t in doc_freqs if len(t) >= 3 and t.isalpha()),
+                            key=lambda t: (len(t), t))
+        self.df    = array('I', (doc_freqs[t] for t in self.terms))
+        self.grams = {}
+
+        max_len = len(self.terms[-1]) if self.terms else 0
+        self.len_start = array('I', [0] * (max_len + 2))
+        for term_id, term in enumerate(self.terms):
+            for gram in trigrams(term):
+                ids = self.grams.get(gram)
+                if ids is None:
+                    ids = self.grams[gram] = array('I')
+                ids.append(term_id)
+        # len_start[n] = first term ID with length >= n
+        n = 0
+        for length in range(max_len + 2):
+            while n < len(self.terms) and len(self.terms[n]) < length:
+                n += 1
+            self.len_start[length] = n
+
+    def _id_range(self, min_len: int, max_len: int):
+        last = len(self.len_start) - 1
+        lo = self.len_start[min(max(min_len, 0), last)]
+        hi = self.len_start[max_len + 1] if max_len + 1 <= last else len(self.terms)
+        return lo, hi
+
+    def suggest(self, term: str, limit: int = 5, max_distance: int = None) -> list:
+        """
+        Close vocabulary terms as (term, distance, doc_freq), best first.
+        Results rank by distance first, so distance 1 is tried alone before the much
+        looser distance-2 filter: if it already fills `limit`, the wider pass is skipped.
+        """
+        if max_distance is None:
+            max_distance = 1 if len(term) <= 4 else 2
+        results = []
+        for distance in range(1, max_distance + 1):
+            results = self._verified(term, distance)
+            if len(results) >= limit:
+                break
+        results.sort(key=lambda r: (r[1], -r[2]))
+        return results[:limit]
+
+    def _verified(self, term: str, max_distance: int) -> list:
+        grams = trigrams(term)
+        lo, hi = self._id_range(len(term) - max_distance, len(term) + max_distance)
+
+        # Each edit destroys at most three trigrams (q-gram lemma), so a match shares at
+        # least min_shared grams and must appear in one of the (len - min_shared + 1)
+        # rarest length-banded lists. Only those lists generate candidates; the rest
+        # are probed by bisect for the candidates alone, unless scanning is cheaper.
+        min_shared = max(1, len(grams) - 3 * max_distance)
+        bands = []
+        for gram in grams:
+            ids = self.grams.get(gram)
+            if ids:
+                bands.append((ids, bisect_left(ids, lo), bisect_left(ids, hi)))
+        bands.sort(key=lambda band: band[2] - band[1])
+        prefix = len(grams) - min_shared + 1
+
+        shared = Counter()
+        for ids, start, stop in bands[:prefix]:
+            shared.update(ids[start:stop])
+        candidates = list(shared)
+        for n, (ids, start, stop) in enumerate(bands[prefix:]):
+            # Drop candidates that cannot reach min_shared even if every list left has them
+            left = len(bands) - prefix - n
+            candidates = [t for t in candidates if shared[t] + left >= min_shared]
+            if stop - start <= self.SCAN_RATIO * len(candidates):
+                # A C-level scan beats per-candidate bisects; terms it adds that are
+                # missing from the prefix lists stay below min_shared either way
+                shared.update(ids[start:stop])
+                continue
+            for term_id in candidates:
+                i = bisect_left(ids, term_id, start, stop)
+                if i < stop and ids[i] == term_id:
+                    shared[term_id] += 1
+
+        # Ties on shared grams go to the more frequent term, as in the final ranking
+        passing   = (t for t, count in shared.items() if count >= min_shared)
+        shortlist = heapq.nlargest(self.SHORTLIST, passing, key=lambda t: (shared[t], self.df[t]))
+        results = []
+        for term_id in shortlist:
+            candidate = self.terms[term_id]
+            dist = edit_distance(term, candidate, max_distance)
+            if 0 < dist <= max_distance:
+                results.append((candidate, dist, self.df[term_id]))
+        return results
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# POSITIONAL INDEX
+# ══════════════════════════════════════════════════════════════════════════════
+class PositionalIndex:
+    """
+    Inverted index of title + abstract tokens with positions.
+
+    Each term maps to three compact arrays: the doc IDs containing it, per-doc offsets
+    into a flat positions array, and the positions themselves. Title tokens occupy
+    positions [0, title_len); the abstract starts one slot later so phrases never
+    span the title/abstract boundary.
+    """
+
+    def __init__(self, papers: list):
+        self.papers    = papers
+        self.title_len = array('I')
+        self.postings  = {}
+        self._cache    = OrderedDict()
+        self._batch_weights = {}
+        self._lock     = threading.Lock()
+        self.clusters  = None   # clusters.TopicClusters, attached when the offline job has been run
+        category_docs  = {label: [] for label in CATEGORY_MAP}
+
+        for doc_id, paper in enumerate(papers):
+            title_tokens = tokenize(paper["title"])
+            local = {}
+            for pos, tok in enumerate(title_tokens):
+                local.setdefault(tok, []).append(pos)
+            start = len(title_tokens) + 1
+            for pos, tok in enumerate(tokenize(paper["summary"]), start):
+                local.setdefault(tok, []).append(pos)
+            self.title_len.append(len(title_tokens))
+
+            terms = parse_terms(paper["terms"])
+            for label, allowed in CATEGORY_MAP.items():
+                if any(t in terms for t in allowed):
+                    category_docs[label].append(doc_id)
+
+            for tok, positions in local.items():
+                entry = self.postings.get(tok)
+                if entry is None:
+                    entry = self.postings[tok] = (array('I'), array('I', [0]), array('I'))
+                docs, offsets, flat = entry
+                docs.append(doc_id)
+                flat.extend(positions)
+                offsets.append(len(flat))
+
+        self.vocab = TrigramIndex({t: len(entry[0]) for t, entry in self.postings.items()})
+        self.category_bits = {
+            label: to_bitset(docs, len(papers)) for label, docs in category_docs.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.papers)
+
+    def doc_freq(self, term: str) -> int:
+        entry = self.postings.get(term)
+        return len(entry[0]) if entry else 0
+
+    def correct_query(self, query: str):
+        """
+        Replace query words that have no postings with their closest vocabulary term.
+        Returns (corrected_query, {original: replacement}).
+        """
+        corrections = {}
+
+        def fix(match):
+            word = match.group(0)
+            term = normalize(word.lower())
+            if term in STOP_WORDS or not term.isalpha() or term in self.postings:
+                return word
+            suggestions = self.vocab.suggest(term, limit=1)
+            if not suggestions:
+                return word
+            corrections[word] = suggestions[0][0]
+            return suggestions[0][0]
+
+        corrected = QUERY_WORD_RE.sub(fix, query)
+        return corrected, corrections
+
+    def positions(self, term: str) -> dict:
+        """doc_id -> positions of `term` in that doc."""
+        entry = self.postings.get(term)
+        if entry is None:
+            return {}
+        docs, offsets, flat = entry
+        return {doc: flat[offsets[i]:offsets[i + 1]] for i, doc in enumerate(docs)}
+
+    def phrase_matches(self, phrase: list) -> dict:
+        """doc_id -> number of exact occurrences of the token sequence `phrase`."""
+        per_term = [self.positions(t) for t in phrase]
+        if not all(per_term):
+            return {}
+        docs = set.intersection(*(set(p) for p in per_term))
+        matches = {}
+        for doc in docs:
+            starts = set(per_term[0][doc])
+            for offset, term_positions in enumerate(per_term[1:], 1):
+                starts &= {pos - offset for pos in term_positions[doc]}
+                if not starts:
+                    break
+            if starts:
+                matches[doc] = len(starts)
+        return matches
+
+    def score(self, query: str) -> dict:
+        """doc_id -> score for every candidate document matching the query."""
+        phrases, terms = parse_query(query)
+        if not terms and not phrases:
+            return {}
+
+        # ── Candidates: docs containing every quoted phrase, else any query term ──
+        phrase_hits = [self.phrase_matches(p) for p in phrases]
+        term_positions = [self.positions(t) for t in terms]
+        if phrases:
+            candidates = set.intersection(*(set(h) for h in phrase_hits))
+        else:
+            candidates = set().union(*term_positions)
+
+        scores = {}
+        for doc in candidates:
+            score = self._doc_score(
+                doc,
+                [positions.get(doc) for positions in term_positions],
+                sum(PHRASE_BONUS * hits.get(doc, 0) for hits in phrase_hits),
+            )
+            if score > 0:
+                scores[doc] = score
+        return scores
+
+    def score_within(self, query: str, allowed) -> dict:
+        """
+        Like score(), but only for the sorted doc IDs in `allowed`. Postings much longer
+        than `allowed` are probed by bisection for each allowed doc; shorter ones are
+        filtered by set membership with map()/compress(), so neither path steps through
+        every posting in Python. Positions are sliced only for the docs that survive.
+        """
+        phrases, terms = parse_query(query)
+        if phrases:
+            keep = set(allowed)
+            return {d: s for d, s in self.score(query).items() if d in keep}
+        if not terms:
+            return {}
+
+        keep, term_positions = None, []
+        for term in terms:
+            entry = self.postings.get(term)
+            if entry is None:
+                term_positions.append({})
+                continue
+            docs, offsets, flat = entry
+            if len(docs) > BISECT_RATIO * len(allowed):
+                hits = bisect_hits(docs, allowed)
+            else:
+                if keep is None:
+                    keep = set(allowed)
+                hits = compress(range(len(docs)), map(keep.__contains__, docs))
+            term_positions.append({docs[i]: flat[offsets[i]:offsets[i + 1]] for i in hits})
+
+        scores = {}
+        for doc in set().union(*term_positions):
+            score = self._doc_score(doc, [positions.get(doc) for positions in term_positions])
+            if score > 0:
+                scores[doc] = score
+        return scores
+
+    def _doc_score(self, doc: int, term_doc_positions: list, phrase_score: float = 0) -> float:
+        """Term counts + title bonus + phrase bonus + proximity boost for one document."""
+        title_len = self.title_len[doc]
+        score, present = phrase_score, []
+        for doc_positions in term_doc_positions:
+            if not doc_positions:
+                continue
+            present.append(doc_positions)
+            score += len(doc_positions)
+            if doc_positions[0] < title_len:
+                score += TITLE_BONUS
+        if len(present) > 1:
+            span = min_span(present)
+            score += PROXIMITY_WEIGHT * (len(present) - 1) * len(present) / span
+        return score
+
+    def _term_weights(self, term: str):
+        """(doc IDs, tf + title bonus) as numpy arrays for batch scoring, built once per term."""
+        cached = self._batch_weights.get(term)
+        if cached is not None or term not in self.postings:
+            return cached
+        import numpy as np
+
+        docs, offsets, flat = self.postings[term]
+        docs    = np.frombuffer(docs, dtype=docs.typecode)
+        offsets = np.frombuffer(offsets, dtype=offsets.typecode)
+        first   = np.frombuffer(flat, dtype=flat.typecode)[offsets[:-1]]
+        in_title = first < np.frombuffer(self.title_len, dtype=self.title_len.typecode)[docs]
+        weights = (np.diff(offsets) + TITLE_BONUS * in_title).astype(np.float32)
+        self._batch_weights[term] = (docs, weights)
+        return docs, weights
+
+    def _positions_in(self, term: str, doc: int):
+        """Positions of `term` in one doc, found by bisecting the term's doc array."""
+        entry = self.postings.get(term)
+        if entry is None:
+            return None
+        docs, offsets, flat = entry
+        i = bisect_left(docs, doc)
+        if i == len(docs) or docs[i] != doc:
+            return None
+        return flat[offsets[i]:offsets[i + 1]]
+
+    def _scored_candidates(self, query: str, probed: tuple = ()):
+        """Scores and candidate bitset for a query, served from a small LRU cache."""
+        key = (" ".join(query.lower().split()), probed)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        if probed:
+            scores = self.score_within(query, self.clusters.allowed(probed))
+        else:
+            scores = self.score(query)
+        entry  = (scores, to_bitset(scores, len(self.papers)))
+        with self._lock:
+            self._cache[key] = entry
+            if len(self._cache) > FACET_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return entry
+
+    def search_faceted(self, query: str, top_k: int = 5, category_filter: str = None,
+                       n_probe: int = None):
+        """
+        Top-k papers plus per-category hit counts for the same query.
+        Counts come from intersecting the candidate bitset with each category's bitset;
+        the category filter is applied the same way, so switching chips reuses the cache.
+
+        With `n_probe` and clusters attached, only papers in the n_probe topic clusters
+        closest to the query are scored (and counted); queries matching no centroid
+        term fall back to the full scan.
+        """
+        probed = ()
+        if n_probe and self.clusters is not None:
+            probed = self.clusters.probe(parse_query(query)[1], n_probe)
+        scores, cand_bits = self._scored_candidates(query, probed)
+        facets = {"All": len(scores)}
+        for label, bits in self.category_bits.items():
+            facets[label] = (cand_bits & bits).bit_count()
+
+        docs = scores
+        if category_filter and category_filter != "All":
+            kept = (cand_bits & self.category_bits.get(category_filter, 0)).to_bytes(
+                (len(self.papers) + 7) // 8, "little"
+            )
+            docs = [d for d in scores if kept[d >> 3] >> (d & 7) & 1]
+
+        ranked = heapq.nsmallest(top_k, docs, key=lambda d: (-scores[d], d))
+        return [self.papers[d] for d in ranked], facets
+
+    def search(self, query: str, top_k: int = 5, category_filter: str = None,
+               n_probe: int = None) -> list:
+        return self.search_faceted(query, top_k, category_filter, n_probe)[0]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BATCH SEARCH
+# ══════════════════════════════════════════════════════════════════════════════
+def search_papers_batch(queries: list, index: PositionalIndex, top_k: int = 5,
+                        category_filter: str = None) -> list:
+    """
+    Top-k papers for every query in one call, for evaluation and prefetch jobs.
+
+    Queries are scored in dense blocks: the sparse query x term matrix is multiplied
+    against the index term-at-a-time, so each posting list is read once per block and
+    added to every query row that contains the term. The best few base-scoring docs
+    per query are then re-scored with the proximity rule, as in search_papers.
+    Proximity adds at most PROXIMITY_WEIGHT * (matched terms - 1), so every doc whose
+    base score plus that bound reaches the k-th exact score is re-scored too, and the
+    result is exactly search_papers'. Quoted-phrase queries, and every query when
+    numpy is missing, take the single-query path.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+    results = [None] * len(queries)
+    parsed  = []
+    for qi, query in enumerate(queries):
+        if np is None or '"' in query:
+            results[qi] = index.search(query, top_k, category_filter)
+        else:
+            parsed.append((qi, parse_query(query)[1]))
+    if not parsed:
+        return results
+
+    n_docs = len(index)
+    mask = None
+    if category_filter and category_filter != "All":
+        bits = index.category_bits.get(category_filter, 0).to_bytes((n_docs + 7) // 8, "little")
+        mask = np.unpackbits(np.frombuffer(bits, np.uint8), bitorder="little")[:n_docs].astype(bool)
+
+    pool  = min(top_k * BATCH_RERANK, n_docs)
+    block = max(1, BATCH_BLOCK_CELLS // max(n_docs, 1))
+    for start in range(0, len(parsed), block):
+        chunk  = parsed[start:start + block]
+        scores  = np.zeros((len(chunk), n_docs), dtype=np.float32)
+        matched = np.zeros((len(chunk), n_docs), dtype=np.uint8)
+
+        rows_by_term = {}
+        for row, (_, terms) in enumerate(chunk):
+            for term in terms:
+                rows_by_term.setdefault(term, []).append(row)
+        for term, rows in rows_by_term.items():
+            weights = index._term_weights(term)
+            if weights is None:
+                continue
+            docs, w = weights
+            if len(rows) == 1:
+                scores[rows[0], docs] += w
+                matched[rows[0], docs] += 1
+            else:
+                scores[np.ix_(rows, docs)] += w
+                matched[np.ix_(rows, docs)] += 1
+
+        if mask is not None:
+            scores[:, ~mask] = 0
+        if pool < n_docs:
+            top = np.argpartition(-scores, pool - 1, axis=1)[:, :pool]
+        else:
+            top = np.broadcast_to(np.arange(n_docs), (len(chunk), n_docs))
+
+        for row, (qi, terms) in enumerate(chunk):
+            base, hits = scores[row], matched[row]
+            exact = {}
+
+            def rescore(docs):
+                for doc in docs:
+                    if doc in exact:
+                        continue
+                    if hits[doc] > 1:
+                        exact[doc] = index._doc_score(doc, [index._positions_in(t, doc) for t in terms])
+                    else:
+                        exact[doc] = float(base[doc])   # one matched term: no proximity boost
+
+            rescore(top[row][base[top[row]] > 0].tolist())
+            ranked = heapq.nsmallest(top_k, exact, key=lambda d: (-exact[d], d))
+            if len(ranked) == top_k and len(terms) > 1:
+                # The pool's k-th exact score is a lower bound on the true k-th, so any doc
+                # whose best possible score falls below it cannot enter the top k
+                ceiling = base + PROXIMITY_WEIGHT * (hits.astype(np.float32) - 1)
+                rescore(np.flatnonzero((base > 0) & (ceiling >= exact[ranked[-1]] - 1e-3)).tolist())
+                ranked = heapq.nsmallest(top_k, exact, key=lambda d: (-exact[d], d))
+            results[qi] = [index.papers[d] for d in ranked]
+    return results
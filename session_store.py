@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+SESSIONS_DB = "research_sessions.sqlite"
+PDF_DIR     = "session_pdfs"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id         TEXT PRIMARY KEY,
+    owner      TEXT NOT NULL DEFAULT '',
+    title      TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id         TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    seq        INTEGER NOT NULL,
+    role       TEXT NOT NULL,
+    content    TEXT NOT NULL,
+    research   INTEGER NOT NULL DEFAULT 0,
+    paper_ids  TEXT NOT NULL DEFAULT '[]',
+    image_url  TEXT,
+    pdf_path   TEXT,
+    pdf_topic  TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, seq);
+"""
+
+
+def session_title(query: str) -> str:
+    return query[:40] + ("..." if len(query) > 40 else "")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SESSION STORE
+# ══════════════════════════════════════════════════════════════════════════════
+class SessionStore:
+    """
+    Chat sessions persisted in a local SQLite database (WAL mode).
+    Messages are written one at a time as they are produced. Retrieved papers are
+    stored as dataset row IDs and PDFs as file paths, never as blobs.
+
+    The store is shared by every browser session of the process, so each chat
+    session belongs to an `owner` key and is only listed or loaded for that owner.
+    """
+
+    def __init__(self, path: str = SESSIONS_DB, pdf_dir: str = PDF_DIR):
+        self.pdf_dir = pdf_dir
+        self._lock   = threading.Lock()
+        self._conn   = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "owner" not in columns:
+            # Databases from before sessions had owners: their chats stay unlisted
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+        self._conn.execute("DROP INDEX IF EXISTS idx_sessions_updated")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sessions_owner ON sessions(owner, updated_at DESC)"
+        )
+
+    # ── Sessions ──
+    def create_session(self, owner: str, title: str) -> str:
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (id, owner, title, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, owner, title, now, now),
+            )
+        return session_id
+
+    def count_sessions(self, owner: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE owner = ?", (owner,)
+            ).fetchone()[0]
+
+    def list_sessions(self, owner: str, page: int = 0, page_size: int = 8) -> list:
+        """The owner's most recently updated sessions first, as (id, title) tuples."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, title FROM sessions WHERE owner = ?"
+                " ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+                (owner, page_size, page * page_size),
+            ).fetchall()
+
+    # ── Messages ──
+    def append_message(self, session_id: str, msg: dict):
+        paper_ids = [p["id"] for p in msg.get("retrieved_papers", [])]
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM messages WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT INTO messages (id, session_id, seq, role, content, research, paper_ids,"
+                " image_url, pdf_path, pdf_topic, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (msg["id"], session_id, seq, msg["role"], msg["content"],
+                 int(msg.get("research", False)), json.dumps(paper_ids),
+                 msg.get("image_url"), msg.get("pdf_path"), msg.get("pdf_topic"), now),
+            )
+            self._conn.execute(
+                "UPDATE sessions SET updated_at = ? WHERE id = ?", (now, session_id)
+            )
+
+    def load_messages(self, owner: str, session_id: str, papers: list) -> list:
+        """
+        Rehydrate a session's messages, resolving paper IDs against the loaded dataset.
+        Another owner's session loads as empty.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.id, m.role, m.content, m.research, m.paper_ids, m.image_url,"
+                " m.pdf_path, m.pdf_topic"
+                " FROM messages AS m JOIN sessions AS s ON s.id = m.session_id"
+                " WHERE m.session_id = ? AND s.owner = ? ORDER BY m.seq",
+                (session_id, owner),
+            ).fetchall()
+
+        messages = []
+        for msg_id, role, content, research, paper_ids, image_url, pdf_path, pdf_topic in rows:
+            msg = {
+                "id":               msg_id,
+                "role":             role,
+                "content":          content,
+                "research":         bool(research),
+                "retrieved_papers": [papers[i] for i in json.loads(paper_ids) if i < len(papers)],
+            }
+            if image_url:
+                msg["image_url"] = image_url
+            if pdf_path and os.path.exists(pdf_path):
+                msg["pdf_path"]  = pdf_path
+                msg["pdf_topic"] = pdf_topic or "report"
+            messages.append(msg)
+        return messages
+
+    def paper_retrieval_counts(self, limit: int = 1000) -> list:
+        """Most frequently retrieved paper IDs across all sessions, as (paper_id, count)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT CAST(p.value AS INTEGER), COUNT(*) AS n"
+                " FROM messages, json_each(messages.paper_ids) AS p"
+                " GROUP BY p.value ORDER BY n DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    # ── PDFs ──
+    def save_pdf(self, msg_id: str, pdf_bytes: bytes) -> str:
+        """Write a generated PDF next to the database and return its path."""
+        os.makedirs(self.pdf_dir, exist_ok=True)
+        path = os.path.join(self.pdf_dir, f"{msg_id}.pdf")
+        with open(path, "wb") as f:
+            f.write(pdf_bytes)
+        return path
@@ -0,0 +1,79 @@
+import time
+import logging
+import threading
+
+from dataset import read_papers
+from search_index import PositionalIndex
+from clusters import clusters_path, load_clusters
+
+logger = logging.getLogger(__name__)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BACKGROUND WARM-UP
+# ══════════════════════════════════════════════════════════════════════════════
+class Warmup:
+    """
+    Builds the search index and warms the LLM on background threads, so the UI shell
+    can render before either is ready. One instance lives per server process.
+    Every step is recorded on `timeline` as (label, seconds since `started`, by default
+    the moment the warm-up was created).
+    """
+
+    def __init__(self, dataset_path: str, warm_model=None, started: float = None):
+        self.t0          = started if started is not None else time.perf_counter()
+        self.timeline    = []
+        self.index       = None
+        self.error       = None
+        self.model_ready = False
+        self.model_error = None
+        self._marked     = set()
+        self._ready      = threading.Event()
+
+        # Model loading happens inside the Ollama server, so it overlaps with the index build
+        threading.Thread(target=self._build_index, args=(dataset_path,),
+                         name="researchmind-index", daemon=True).start()
+        if warm_model is not None:
+            threading.Thread(target=self._warm_model, args=(warm_model,),
+                             name="researchmind-model", daemon=True).start()
+
+    def mark(self, label: str, once: bool = False):
+        if once and label in self._marked:
+            return
+        self._marked.add(label)
+        elapsed = time.perf_counter() - self.t0
+        self.timeline.append((label, elapsed))
+        logger.info("%s: %.0f ms", label, elapsed * 1000)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout: float = None) -> PositionalIndex:
+        self._ready.wait(timeout)
+        return self.index
+
+    def _build_index(self, dataset_path: str):
+        try:
+            papers = read_papers(dataset_path)
+            self.mark(f"dataset loaded ({len(papers):,} papers)")
+            self.index = PositionalIndex(papers)
+            self.mark("search index built")
+            self.index.clusters = load_clusters(clusters_path(dataset_path), len(papers))
+            if self.index.clusters is not None:
+                self.mark(f"topic clusters loaded ({len(self.index.clusters)})")
+        except Exception as e:
+            self.error = e
+            self.index = PositionalIndex([])
+            self.mark("dataset load failed")
+        finally:
+            self._ready.set()
+
+    def _warm_model(self, warm_model):
+        try:
+            warm_model()
+            self.model_ready = True
+            self.mark("model warm")
+        except Exception as e:
+            self.model_error = e
+            self.mark("model warm-up failed")
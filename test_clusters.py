@@ -0,0 +1,104 @@
+"""
+Topic clusters: the saved round trip, cluster probing, pruned scoring and the recall evaluation.
+
+    python -m pytest -q
+"""
+from array import array
+
+import pytest
+
+import search_index
+from clusters import TopicClusters, evaluate, load_clusters, save_clusters
+from search_index import PositionalIndex
+
+CORPUS = [
+    ("Graph neural networks for molecules", "Graph neural network models predict molecule properties."),
+    ("Robot grasping with reinforcement learning", "Reinforcement learning trains a robot arm to grasp."),
+    ("Message passing on molecule graphs", "Neural message passing over molecule graph structure."),
+    ("Learning to grasp with a robot arm", "A robot arm learns grasping from reinforcement signals."),
+    ("Neural networks for image grasping", "Convolutional neural networks detect grasp points in images."),
+    ("Image segmentation with neural networks", "Neural networks segment medical image data."),
+]
+LABELS = [0, 1, 0, 1, 1, 0]
+META = {"n_papers": len(CORPUS), "k": 2, "clusters": [
+    {"label": "graph / molecule", "terms": {"graph": 0.6, "molecul": 0.5, "neural": 0.2}},
+    {"label": "robot / grasp", "terms": {"robot": 0.6, "grasp": 0.5, "neural": 0.1}},
+]}
+
+
+@pytest.fixture
+def index():
+    index = PositionalIndex([
+        {"id": i, "title": title, "summary": summary, "terms": ["cs.LG"]}
+        for i, (title, summary) in enumerate(CORPUS)
+    ])
+    index.clusters = TopicClusters(META, array('H', LABELS))
+    return index
+
+
+def test_clusters_round_trip(tmp_path):
+    np   = pytest.importorskip("numpy")
+    path = str(tmp_path / "arxiv_data.clusters")
+    save_clusters(path, np.array(LABELS), META)
+
+    clusters = load_clusters(path, len(CORPUS))
+    assert clusters is not None and len(clusters) == 2
+    assert clusters.meta == META
+    assert [list(m) for m in clusters.members] == [[0, 2, 5], [1, 3, 4]]
+    assert list(clusters.allowed((0, 1))) == list(range(len(CORPUS)))
+    assert load_clusters(path, len(CORPUS) + 1) is None
+    assert load_clusters(str(tmp_path / "missing"), len(CORPUS)) is None
+
+
+def test_kmeans_clusters_match_their_labels(tmp_path):
+    pytest.importorskip("numpy")
+    pytest.importorskip("scipy")
+    from clusters import assign, describe, minibatch_kmeans
+    from related import tfidf_features
+
+    index = PositionalIndex([{"id": i, "title": t, "summary": s, "terms": []}
+                             for i, (t, s) in enumerate(CORPUS)])
+    X, vocab     = tfidf_features(index, min_df=1, max_df=1.0)
+    centroids    = minibatch_kmeans(X, k=2, batch_size=len(index), iterations=5, log=lambda *_: None)
+    labels, sims = assign(X, centroids)
+    meta = {"n_papers": len(index), "k": 2, "clusters": describe(centroids, labels, sims, vocab)}
+    path = str(tmp_path / "arxiv_data.clusters")
+    save_clusters(path, labels, meta)
+
+    clusters = load_clusters(path, len(index))
+    for cid in range(2):
+        assert list(clusters.members[cid]) == [d for d, label in enumerate(labels.tolist()) if label == cid]
+
+
+def test_probe_weighs_centroid_terms(index):
+    assert index.clusters.probe(["robot", "neural"], n_probe=1) == (1,)
+    assert index.clusters.probe(["molecul", "grasp", "graph"], n_probe=2) == (0, 1)
+    assert index.clusters.probe(["unknown"]) == ()
+
+
+@pytest.mark.parametrize("ratio", [0, 10 ** 6])   # always bisect / always filter by membership
+@pytest.mark.parametrize("query", ["neural networks", "robot grasp image", '"neural networks"', "zzz"])
+def test_score_within_equals_filtered_full_score(index, monkeypatch, ratio, query):
+    monkeypatch.setattr(search_index, "BISECT_RATIO", ratio)
+    for probed in [(0,), (1,), (0, 1)]:
+        allowed  = index.clusters.allowed(probed)
+        expected = {d: s for d, s in index.score(query).items() if d in set(allowed)}
+        assert index.score_within(query, allowed) == expected
+
+
+def test_pruned_search_stays_inside_probed_clusters(index):
+    ids = [p["id"] for p in index.search("robot neural", top_k=10, n_probe=1)]
+    assert ids and set(ids) <= {1, 3, 4}
+    # No centroid term in the query: falls back to the full scan
+    assert len(index.search("image", top_k=10, n_probe=1)) == 2
+
+
+def test_evaluate_times_both_paths_cold(index, monkeypatch):
+    calls = []
+    score = index.score
+    monkeypatch.setattr(index, "score", lambda query: calls.append(query) or score(query))
+
+    # "image" probes no cluster, so the pruned search is a full scan; it must not be a cache hit
+    result = evaluate(index, ["image", "image", "robot grasp"], n_probe=2, top_k=3)
+    assert calls == ["image", "image", "image", "image", "robot grasp"]
+    assert result["recall"] == 1.0 and result["queries"] == 3
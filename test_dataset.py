@@ -0,0 +1,88 @@
+"""
+Columnar paper table: byte offsets with non-ASCII text, sequence behaviour and Paper views.
+
+    python -m pytest -q
+"""
+import csv
+import pickle
+import random
+
+import pytest
+
+from dataset import Paper, PaperTable, dataset_fingerprint, read_papers
+
+ROWS = [
+    ("Schrödinger bridges", "Entropic transport — with ε-regularisation.", ["math.OC", "cs.LG"]),
+    ("", "", []),
+    ("Übersetzung ins 日本語", "Neural translation of 漢字 and emoji 🚀.", ["cs.CL"]),
+    ("Plain title", "Plain abstract.", ["cs.LG"]),
+]
+
+
+@pytest.fixture
+def table():
+    table = PaperTable()
+    for title, summary, terms in ROWS:
+        table.append(title, summary, terms)
+    return table
+
+
+def test_rows_round_trip_through_byte_offsets(table):
+    assert len(table) == len(ROWS)
+    for i, (title, summary, terms) in enumerate(ROWS):
+        assert (table.title(i), table.summary(i), table.terms(i)) == (title, summary, terms)
+        assert table[i].to_dict() == {"id": i, "title": title, "summary": summary, "terms": terms}
+    # Each category name is stored once
+    assert table.categories == ["math.OC", "cs.LG", "cs.CL"]
+    assert list(table.category_ids(3)) == [1]
+
+
+def test_sequence_indexing(table):
+    assert table[-1]["title"] == "Plain title"
+    assert [p.id for p in table[1:3]] == [1, 2]
+    assert [p.id for p in table[::-2]] == [3, 1]
+    assert [p.id for p in table] == [0, 1, 2, 3]
+    with pytest.raises(IndexError):
+        table[len(ROWS)]
+    with pytest.raises(IndexError):
+        table[-len(ROWS) - 1]
+    sample = random.Random(0).sample(table, 2)
+    assert len({p.id for p in sample}) == 2
+
+
+def test_paper_view_behaves_like_a_row(table):
+    paper = table[2]
+    assert paper["id"] == 2 and paper.get("terms") == ["cs.CL"]
+    assert paper.get("missing", "default") == "default"
+    with pytest.raises(KeyError):
+        paper["missing"]
+
+    assert paper == table[2] and hash(paper) == hash(table[2])
+    assert paper != table[3] and paper != paper.to_dict()
+    assert {table[2], table[2], table[3]} == {table[2], table[3]}
+    assert "Übersetzung" in repr(paper)
+
+
+def test_paper_pickles_as_a_plain_dict(table):
+    restored = pickle.loads(pickle.dumps(table[0]))
+    assert type(restored) is dict
+    assert restored == {"id": 0, "title": ROWS[0][0], "summary": ROWS[0][1], "terms": ROWS[0][2]}
+    assert isinstance(table[0], Paper) and len(pickle.dumps(table[0])) < 200
+
+
+def test_read_papers_from_csv(tmp_path):
+    path = tmp_path / "arxiv_data.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["titles", "summaries", "terms"])
+        for title, summary, terms in ROWS:
+            writer.writerow([f"  {title} ", summary, repr(terms)])
+        writer.writerow(["Broken terms", "Abstract.", "not a list"])
+
+    papers = read_papers(str(path))
+    assert [p.to_dict() for p in papers[:len(ROWS)]] == [
+        {"id": i, "title": t, "summary": s, "terms": terms} for i, (t, s, terms) in enumerate(ROWS)
+    ]
+    assert papers[-1]["terms"] == []
+    assert dataset_fingerprint(papers) == dataset_fingerprint([p.to_dict() for p in papers])
+    assert len(read_papers(str(tmp_path / "missing.csv"))) == 0
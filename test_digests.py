@@ -0,0 +1,67 @@
+"""
+Digest job checkpointing and the dataset-snapshot guard of the digest store.
+
+    python -m pytest -q
+"""
+import pytest
+
+import digests
+from digests import DigestStore, build_digests
+
+PAPERS = [{"id": i, "title": f"Paper {i}", "summary": f"Abstract of paper {i}."} for i in range(6)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DigestStore(str(tmp_path / "arxiv_data.digests.sqlite"))
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Stand-in for the LLM call; records which papers were digested and fails paper 4 once."""
+    seen, failed = [], set()
+
+    def fake_digest(paper, llm):
+        seen.append(paper["id"])
+        if paper["id"] == 4 and not failed:
+            failed.add(4)
+            raise RuntimeError("model busy")
+        return f"digest {paper['id']}"
+
+    monkeypatch.setattr(digests, "digest_paper", fake_digest)
+    return seen
+
+
+def test_interrupted_run_resumes_from_checkpoint(store, calls):
+    assert build_digests(PAPERS, [0, 1, 2], store, llm=None, workers=2, log=lambda *_: None) == 3
+    assert sorted(calls) == [0, 1, 2]
+
+    calls.clear()
+    assert build_digests(PAPERS, list(range(6)), store, llm=None, workers=2, log=lambda *_: None) == 2
+    assert sorted(calls) == [3, 4, 5]
+    assert store.existing_ids() == {0, 1, 2, 3, 5}
+
+    # The failed paper is retried on the next run; IDs past the dataset are ignored
+    calls.clear()
+    assert build_digests(PAPERS, [4, 99], store, llm=None, log=lambda *_: None) == 1
+    assert calls == [4]
+    assert store.get_many([4, 5]) == {4: "digest 4", 5: "digest 5"}
+
+
+def test_store_is_bound_to_its_dataset_snapshot(store, calls):
+    build_digests(PAPERS, [0], store, llm=None, log=lambda *_: None)
+    assert store.snapshot()["n_papers"] == len(PAPERS)
+    assert store.matches(PAPERS)
+
+    edited = PAPERS[:1] + [dict(PAPERS[1], title="Another paper")] + PAPERS[2:]
+    assert not store.matches(PAPERS[:-1])
+    assert not store.matches(edited)
+    with pytest.raises(ValueError):
+        build_digests(edited, [1], store, llm=None, log=lambda *_: None)
+
+
+def test_store_without_snapshot_matches_nothing(store):
+    store.put(0, "digest of an unknown dataset")
+    assert not store.matches(PAPERS)
+    with pytest.raises(ValueError):
+        store.claim(PAPERS)
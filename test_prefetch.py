@@ -0,0 +1,97 @@
+"""
+Prefetcher: take() semantics, the LRU bound, CPU/LLM budgets and foreground pausing.
+
+    python -m pytest -q
+"""
+import time
+import threading
+
+from prefetch import Prefetcher
+
+
+def drain(prefetcher: Prefetcher):
+    """Wait until every job queued so far has finished (the pool has one worker)."""
+    prefetcher._pool.submit(lambda: None).result(timeout=10)
+
+
+def test_take_hands_out_a_result_once():
+    prefetcher = Prefetcher()
+    assert prefetcher.submit(("retrieve", "gnn"), lambda: "papers")
+    drain(prefetcher)
+    assert not prefetcher.submit(("retrieve", "gnn"), lambda: "again")   # already prepared
+
+    assert prefetcher.take(("retrieve", "gnn")) == "papers"
+    assert prefetcher.take(("retrieve", "gnn")) is None
+    assert prefetcher.take(("retrieve", "other")) is None
+    assert (prefetcher.hits, prefetcher.misses) == (1, 2)
+
+
+def test_failed_job_caches_nothing_and_can_be_resubmitted(caplog):
+    prefetcher = Prefetcher()
+
+    def broken():
+        raise RuntimeError("no model")
+
+    prefetcher.submit(("summary", (1, 2)), broken)
+    drain(prefetcher)
+    assert prefetcher.take(("summary", (1, 2))) is None
+    assert "no model" in caplog.text
+    assert prefetcher.submit(("summary", (1, 2)), lambda: "draft")
+
+
+def test_cache_evicts_least_recently_prepared():
+    prefetcher = Prefetcher(cache_size=2)
+    for name in ("a", "b", "c"):
+        prefetcher.submit(("pdf", name), lambda name=name: name)
+    drain(prefetcher)
+    assert prefetcher.take(("pdf", "a")) is None
+    assert prefetcher.take(("pdf", "b")) == "b"
+    assert prefetcher.take(("pdf", "c")) == "c"
+
+
+def test_llm_jobs_stop_at_the_llm_budget():
+    prefetcher = Prefetcher(llm_budget=1)
+    prefetcher.submit(("summary", 1), lambda: "first", llm=True)
+    prefetcher.submit(("summary", 2), lambda: "second", llm=True)
+    prefetcher.submit(("retrieve", 3), lambda: "not an llm job")
+    drain(prefetcher)
+    assert prefetcher.take(("summary", 1)) == "first"
+    assert prefetcher.take(("summary", 2)) is None
+    assert prefetcher.take(("retrieve", 3)) == "not an llm job"
+
+
+def test_jobs_stop_once_the_cpu_budget_is_spent():
+    prefetcher = Prefetcher(cpu_budget_s=0.01)
+
+    def burn():
+        started = time.thread_time()
+        while time.thread_time() - started < 0.02:
+            pass
+        return "done"
+
+    prefetcher.submit(("retrieve", 1), burn)
+    prefetcher.submit(("retrieve", 2), lambda: "skipped")
+    drain(prefetcher)
+    assert prefetcher.take(("retrieve", 1)) == "done"
+    assert prefetcher.take(("retrieve", 2)) is None
+
+
+def test_jobs_wait_until_every_foreground_request_is_done():
+    prefetcher = Prefetcher()
+    ran = threading.Event()
+    prefetcher.foreground()          # user A
+    prefetcher.foreground()          # user B
+    prefetcher.submit(("retrieve", "q"), ran.set)
+
+    prefetcher.idle()                # A finishes; B is still being served
+    assert not ran.wait(0.5)
+    prefetcher.idle()                # B finishes
+    assert ran.wait(2)
+
+
+def test_lease_bounds_the_wait_for_a_request_that_never_finishes():
+    prefetcher = Prefetcher(lease_s=0.3)
+    ran = threading.Event()
+    prefetcher.foreground()
+    prefetcher.submit(("retrieve", "q"), ran.set)
+    assert ran.wait(2)
@@ -0,0 +1,77 @@
+"""
+Related-paper graph: k-NN build, the memory-mapped round trip and neighbour expansion.
+
+    python -m pytest -q
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from related import expand_with_neighbours, knn_graph, load_graph, save_graph, tfidf_features
+from search_index import PositionalIndex
+
+CORPUS = [
+    ("Graph neural networks for molecules", "Graph neural network models predict molecule properties."),
+    ("Message passing on molecule graphs", "Neural message passing over molecule graph structure."),
+    ("Robot grasping with reinforcement learning", "Reinforcement learning trains a robot arm to grasp."),
+    ("Learning to grasp with a robot arm", "A robot arm learns grasping from reinforcement signals."),
+    ("Image segmentation with convolutions", "Convolutional networks segment medical image data."),
+    ("Convolutional image classification", "Image classification with deep convolutional networks."),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return PositionalIndex([
+        {"id": i, "title": title, "summary": summary, "terms": ["cs.LG"]}
+        for i, (title, summary) in enumerate(CORPUS)
+    ])
+
+
+@pytest.fixture
+def graph_arrays(index):
+    X, _ = tfidf_features(index, min_df=1, max_df=1.0)
+    return knn_graph(X, k=2, log=lambda *_: None)
+
+
+def test_graph_links_papers_on_the_same_topic(index, graph_arrays):
+    indptr, indices, scores = graph_arrays
+    for doc in range(len(index)):
+        lo, hi = indptr[doc], indptr[doc + 1]
+        assert doc not in indices[lo:hi].tolist()
+        assert list(scores[lo:hi]) == sorted(scores[lo:hi], reverse=True)
+        if hi > lo:
+            assert indices[lo] == doc ^ 1   # pairs (0, 1), (2, 3), (4, 5) share a topic
+
+
+def test_graph_round_trip(index, graph_arrays, tmp_path):
+    indptr, indices, scores = graph_arrays
+    path = str(tmp_path / "arxiv_data.related")
+    save_graph(path, indptr, indices, scores, {"n_papers": len(index)})
+
+    graph = load_graph(path, len(index))
+    assert graph is not None and len(graph) == len(index)
+    for doc in range(len(index)):
+        lo, hi = indptr[doc], indptr[doc + 1]
+        assert graph.neighbours(doc) == pytest.approx(
+            list(zip(indices[lo:hi].tolist(), scores[lo:hi].tolist()))
+        )
+    assert graph.neighbours(len(index)) == []
+    assert load_graph(path, len(index) + 1) is None
+    assert load_graph(str(tmp_path / "missing"), len(index)) is None
+
+
+def test_expansion_takes_best_neighbours_round_robin(tmp_path):
+    # 0 -> 2 (0.9), 3 (0.5);  1 -> 0 (0.8), 4 (0.1);  2 -> nothing
+    path = str(tmp_path / "arxiv_data.related")
+    save_graph(path, np.array([0, 2, 4, 4, 4, 4], dtype=np.uint32),
+               np.array([2, 3, 0, 4], dtype=np.uint32),
+               np.array([0.9, 0.5, 0.8, 0.1], dtype=np.float32), {"n_papers": 5})
+    graph  = load_graph(path, 5)
+    corpus = [{"id": i} for i in range(5)]
+
+    assert expand_with_neighbours(corpus[:2], graph, corpus) == [corpus[2], corpus[3]]
+    assert expand_with_neighbours(corpus[:2], graph, corpus, limit=1) == [corpus[2]]
+    assert expand_with_neighbours(corpus[:2], graph, corpus, min_score=0.0) == corpus[2:5]
+    assert expand_with_neighbours(corpus[:2], None, corpus) == []
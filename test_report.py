@@ -0,0 +1,79 @@
+"""
+Bulk report export: section order, bookmarks, markup escaping and failed-section placeholders.
+
+    python -m pytest -q
+"""
+import io
+
+import pytest
+
+pytest.importorskip("reportlab")
+pypdf = pytest.importorskip("pypdf")
+
+from report import PdfConcatenator, _section_jobs, export_bulk_report, generate_pdf
+
+PAPER = {"title": "Bounds for p < 0.05 & friends", "summary": "We test <unk> tokens & more.",
+         "terms": ["cs.LG"]}
+
+
+def section(title: str, papers: list = None) -> dict:
+    return {"title": title, "content": f"## {title}\n1. **Result** — p < 0.05 & *x > y*",
+            "papers": papers if papers is not None else [PAPER]}
+
+
+def test_export_orders_sections_and_bookmarks_their_first_page(tmp_path):
+    sections = [section(f"Topic {i} <{i}> & co") for i in range(5)]
+    out = export_bulk_report(sections, str(tmp_path / "report.pdf"), workers=2, log=lambda *_: None)
+
+    reader = pypdf.PdfReader(out, strict=True)
+    titles = [item.title for item in reader.outline]
+    starts = [reader.get_destination_page_number(item) for item in reader.outline]
+    assert titles == [s["title"] for s in sections]
+    assert starts == sorted(starts) and starts[0] >= 1
+    for title, start in zip(titles, starts):
+        assert title in reader.pages[start].extract_text()
+    assert "Contents" in reader.pages[0].extract_text()
+
+
+def test_failed_section_becomes_a_placeholder(tmp_path):
+    broken = section("Broken", papers=[{"title": None, "summary": "s", "terms": []}])
+    logged = []
+    out = export_bulk_report([section("Fine"), broken, section("Also fine")],
+                             str(tmp_path / "report.pdf"), workers=1, log=logged.append)
+
+    reader = pypdf.PdfReader(out)
+    assert [item.title for item in reader.outline] == ["Fine", "Broken", "Also fine"]
+    placeholder = reader.pages[reader.get_destination_page_number(reader.outline[1])].extract_text()
+    assert "could not be rendered" in placeholder
+    assert any("section 2/3 replaced by a placeholder" in line for line in logged)
+
+
+def test_section_payloads_are_built_on_demand(tmp_path):
+    class Sections(list):
+        touched = 0
+
+        def __iter__(self):
+            for sec in super().__iter__():
+                Sections.touched += 1
+                yield sec
+
+    jobs = _section_jobs(Sections(section(f"T{i}") for i in range(100)), str(tmp_path))
+    path, number, total, payload = next(jobs)
+    assert (number, total, Sections.touched) == (1, 100, 1)
+    assert payload["papers"] == [PAPER]
+
+
+def test_concatenator_streams_whole_files():
+    single = generate_pdf("x < y", "a & b <c>", [PAPER])
+    out = io.BytesIO()
+    merged = PdfConcatenator(out)
+    merged.append(io.BytesIO(single), title="First")
+    merged.append(io.BytesIO(single))
+    merged.append(io.BytesIO(single), title="Third")
+    merged.close()
+
+    reader = pypdf.PdfReader(io.BytesIO(out.getvalue()), strict=True)
+    per_file = len(pypdf.PdfReader(io.BytesIO(single)).pages)
+    assert len(reader.pages) == 3 * per_file
+    assert [(item.title, reader.get_destination_page_number(item)) for item in reader.outline] == \
+        [("First", 0), ("Third", 2 * per_file)]
@@ -0,0 +1,111 @@
+"""
+Behaviour of the positional index on a tiny in-memory corpus.
+
+    python -m pytest -q
+"""
+import pytest
+
+from search_index import (CATEGORY_MAP, PositionalIndex, TrigramIndex, edit_distance, min_span,
+                          search_papers_batch)
+
+CORPUS = [
+    ("Graph neural networks for molecules",
+     "We apply graph neural network models to molecule property prediction.", ["cs.LG"]),
+    ("Neural machine translation with attention",
+     "An attention based neural network translates text between languages.", ["cs.CL"]),
+    ("Attention over graph data",
+     "Graph structure guides the attention network, and neural methods follow.", ["cs.LG", "cs.AI"]),
+    ("Robot grasping with reinforcement learning",
+     "Reinforcement learning trains a robot arm to grasp objects.", ["cs.RO"]),
+    ("Image segmentation with convolutional networks",
+     "Convolutional network models segment medical image data.", ["cs.CV"]),
+    ("Learning to grasp from images",
+     "A convolutional policy learns robot grasping from camera images.", ["cs.RO", "cs.CV"]),
+    # Same terms and counts, different distance between "quantum" and "annealing"
+    ("Distant terms",
+     "Quantum methods for vehicle routing problems often rely on annealing.", ["cs.AI"]),
+    ("Adjacent terms",
+     "Quantum annealing solves vehicle routing problems quickly in practice.", ["cs.AI"]),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return PositionalIndex([
+        {"id": i, "title": title, "summary": summary, "terms": terms}
+        for i, (title, summary, terms) in enumerate(CORPUS)
+    ])
+
+
+def ids(papers) -> list:
+    return [p["id"] for p in papers]
+
+
+# ── Retrieval ──
+def test_phrase_matches_only_adjacent_tokens(index):
+    assert index.phrase_matches(["graph", "neural"]) == {0: 2}
+    assert index.phrase_matches(["neural", "graph"]) == {}
+    # Paper 2 has both words, but never next to each other
+    assert ids(index.search('"graph neural"', top_k=10)) == [0]
+
+
+def test_proximity_ranks_tighter_matches_first(index):
+    assert ids(index.search("quantum annealing", top_k=2)) == [7, 6]
+
+
+def test_min_span_is_the_shortest_covering_window():
+    assert min_span([[0, 10], [3, 12], [11]]) == 3
+    assert min_span([[4], [4 + 6]]) == 7
+    assert min_span([[1, 2, 3]]) == 1
+
+
+# ── Query correction ──
+def test_correct_query_fixes_unknown_words_only(index):
+    corrected, corrections = index.correct_query("atention reinforcment graph")
+    assert corrected == "attention reinforcement graph"
+    assert corrections == {"atention": "attention", "reinforcment": "reinforcement"}
+    assert index.correct_query("graph xyzzyq") == ("graph xyzzyq", {})
+
+
+def test_suggest_prefers_closer_then_more_frequent_terms():
+    vocab = TrigramIndex({"transformer": 40, "transformed": 3, "transform": 90, "translation": 10})
+    assert vocab.suggest("tranformer", limit=2) == [("transformer", 1, 40), ("transformed", 2, 3)]
+    assert [t for t, _, _ in vocab.suggest("transfrm", limit=1)] == ["transform"]
+
+
+def test_edit_distance_stops_at_limit():
+    assert edit_distance("graph", "graph", 2) == 0
+    assert edit_distance("atention", "attention", 2) == 1
+    assert edit_distance("network", "netwrok", 2) == 1   # adjacent transposition
+    assert edit_distance("abc", "xyzw", 2) > 2
+
+
+# ── Facets ──
+@pytest.mark.parametrize("query", ["network", "neural attention", "robot grasp image"])
+def test_facets_match_brute_force(index, query):
+    matched = set(index.score(query))
+    results, facets = index.search_faceted(query, top_k=10)
+    assert facets["All"] == len(matched) == len(results)
+    for label, allowed in CATEGORY_MAP.items():
+        expected = {d for d in matched if any(t in allowed for t in index.papers[d]["terms"])}
+        assert facets[label] == len(expected)
+        filtered = index.search_faceted(query, top_k=10, category_filter=label)[0]
+        assert set(ids(filtered)) == expected
+
+
+# ── Batch search ──
+@pytest.mark.parametrize("category", [None, "Machine Learning", "Robotics"])
+def test_batch_search_matches_single_queries(index, category):
+    pytest.importorskip("numpy")
+    queries = ["quantum annealing", "neural network attention", "robot grasp image", "graph",
+               '"graph neural"', "nothing matches this"]
+    batch = search_papers_batch(queries, index, top_k=3, category_filter=category)
+    assert [ids(r) for r in batch] == [ids(index.search(q, 3, category)) for q in queries]
+
+
+def test_batch_rerank_reaches_past_the_initial_pool(index, monkeypatch):
+    pytest.importorskip("numpy")
+    import search_index
+    # A one-doc pool would hold the "distant" paper; proximity must still rank "adjacent" first
+    monkeypatch.setattr(search_index, "BATCH_RERANK", 1)
+    assert ids(search_papers_batch(["quantum annealing"], index, top_k=1)[0]) == [7]
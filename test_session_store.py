@@ -0,0 +1,72 @@
+"""
+Saved chat sessions: message round trip, sidebar pagination and per-owner isolation.
+
+    python -m pytest -q
+"""
+import sqlite3
+
+import pytest
+
+from session_store import SessionStore
+
+PAPERS = [{"id": i, "title": f"Paper {i}"} for i in range(5)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.sqlite"), str(tmp_path / "pdfs"))
+
+
+def test_messages_round_trip(store):
+    session = store.create_session("alice", "graph neural networks")
+    pdf = store.save_pdf("m2", b"%PDF-1.4 test")
+    store.append_message(session, {"id": "m1", "role": "user", "content": "graph neural networks"})
+    store.append_message(session, {
+        "id": "m2", "role": "assistant", "content": "Answer", "research": True,
+        "retrieved_papers": [PAPERS[3], PAPERS[1]], "pdf_path": pdf, "pdf_topic": "GNNs",
+    })
+
+    messages = store.load_messages("alice", session, PAPERS)
+    assert [m["id"] for m in messages] == ["m1", "m2"]
+    assert messages[0]["research"] is False and messages[0]["retrieved_papers"] == []
+    assert messages[1]["retrieved_papers"] == [PAPERS[3], PAPERS[1]]
+    assert messages[1]["pdf_path"] == pdf and messages[1]["pdf_topic"] == "GNNs"
+    assert sorted(store.paper_retrieval_counts()) == [(1, 1), (3, 1)]
+
+
+def test_sessions_page_most_recent_first(store):
+    sessions = [store.create_session("alice", f"chat {i}") for i in range(5)]
+    store.append_message(sessions[1], {"id": "m", "role": "user", "content": "bump"})
+
+    assert store.count_sessions("alice") == 5
+    pages = [store.list_sessions("alice", page, page_size=2) for page in range(3)]
+    assert [len(p) for p in pages] == [2, 2, 1]
+    listed = [session_id for page in pages for session_id, _ in page]
+    assert listed[0] == sessions[1]
+    assert sorted(listed) == sorted(sessions)
+
+
+def test_sessions_are_private_to_their_owner(store):
+    mine = store.create_session("alice", "mine")
+    store.append_message(mine, {"id": "m1", "role": "user", "content": "secret"})
+    store.create_session("bob", "theirs")
+
+    assert store.count_sessions("alice") == 1
+    assert store.list_sessions("bob") != store.list_sessions("alice")
+    assert [title for _, title in store.list_sessions("alice")] == ["mine"]
+    assert store.load_messages("bob", mine, PAPERS) == []
+
+
+def test_sessions_without_owner_column_are_migrated(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE sessions (id TEXT PRIMARY KEY, title TEXT NOT NULL,"
+                 " created_at REAL NOT NULL, updated_at REAL NOT NULL)")
+    conn.execute("INSERT INTO sessions VALUES ('old', 'legacy', 0, 0)")
+    conn.commit()
+    conn.close()
+
+    store = SessionStore(path, str(tmp_path / "pdfs"))
+    assert store.count_sessions("alice") == 0
+    store.create_session("alice", "new")
+    assert [title for _, title in store.list_sessions("alice")] == ["new"]
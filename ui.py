@@ -1,9 +1,12 @@
 import streamlit as st
 import ast
+import html
 
 
 # ── Helper ────────────────────────────────────────────────────────────────────
-def parse_terms(terms_str: str):
+def parse_terms(terms_str):
+    if isinstance(terms_str, list):
+        return terms_str
     try:
         return ast.literal_eval(terms_str)
     except:
@@ -251,7 +254,98 @@ section[data-testid="stSidebar"] .block-container { padding: 1rem !important; }
 # ══════════════════════════════════════════════════════════════════════════════
 # 2. SIDEBAR
 # ══════════════════════════════════════════════════════════════════════════════
-def render_sidebar(papers: list):
+SIDEBAR_PAGE_SIZE = 8
+
+
+def _reset_conversation(messages: list, session_id):
+    st.session_state.messages = messages
+    st.session_state.session_id = session_id
+    st.session_state.message_window = MESSAGE_WINDOW
+    st.session_state.render_cache = {}
+    st.session_state.last_facets = {}
+    st.session_state.last_search = None
+
+    # ── Restore the PDF follow-up context from the last research turn ──
+    topic, content = "", ""
+    for prev, msg in zip(messages, messages[1:]):
+        if msg["role"] == "assistant" and msg.get("research"):
+            topic, content = prev["content"], msg["content"]
+    st.session_state.last_research_topic = topic
+    st.session_state.last_research_content = content
+
+
+def _render_readiness(warmup):
+    if warmup.ready and not st.session_state.dataset_loaded:
+        st.rerun()   # index just finished: rerun the full page so it can use it
+
+    papers = warmup.index.papers if warmup.ready else []
+    if not warmup.ready:
+        st.markdown("""
+        <div style='font-size:12px;color:#9aa0a6;line-height:1.9;'>
+            <span style='color:#fbbc04;font-weight:600;'>⏳ Indexing…</span><br>
+            You can start typing — the first search waits for the index.
+        </div>
+        """, unsafe_allow_html=True)
+    elif papers:
+        st.markdown(f"""
+        <div style='font-size:12px;color:#9aa0a6;line-height:1.9;'>
+            <span style='color:#34a853;font-weight:600;'>✅ Loaded</span><br>
+            📄 <b style='color:#bdc1c6;'>Papers:</b> {len(papers):,}<br>
+            🗂️ <b style='color:#bdc1c6;'>Source:</b> ArXiv CSV<br>
+            🔍 <b style='color:#bdc1c6;'>Search:</b> Keyword + Context
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.markdown("""
+        <div style='font-size:12px;color:#9aa0a6;line-height:1.9;'>
+            <span style='color:#ea4335;font-weight:600;'>⚠️ Not Found</span><br>
+            Place <code>arxiv_data.csv</code> next to <code>app.py</code>
+        </div>
+        """, unsafe_allow_html=True)
+
+    if warmup.model_ready:
+        model_status = "<span style='color:#34a853;font-weight:600;'>✅ Model ready</span>"
+    elif warmup.model_error:
+        model_status = "<span style='color:#ea4335;font-weight:600;'>⚠️ Ollama not reachable</span>"
+    else:
+        model_status = "<span style='color:#fbbc04;font-weight:600;'>🔥 Warming up model…</span>"
+    st.markdown(f"<div style='font-size:12px;line-height:1.9;'>{model_status}</div>",
+                unsafe_allow_html=True)
+
+    with st.expander("⏱️ Startup timeline"):
+        for label, elapsed in warmup.timeline:
+            st.markdown(
+                f"<div style='font-size:12px;color:#9aa0a6;'>{elapsed * 1000:,.0f} ms — {label}</div>",
+                unsafe_allow_html=True
+            )
+
+
+def _render_topic_map(clusters, papers: list):
+    """Browse the precomputed topic clusters (see clusters.py); nothing is computed per query."""
+    st.markdown("<div class='sidebar-title'>Topic Map</div>", unsafe_allow_html=True)
+    topics = clusters.clusters
+    choice = st.selectbox(
+        "Topic", sorted(range(len(topics)), key=lambda c: -topics[c]["size"]), index=None,
+        format_func=lambda c: f"{topics[c]['label']} ({topics[c]['size']:,})",
+        placeholder=f"Browse {len(topics)} topics…", key="topic_map", label_visibility="collapsed",
+    )
+    if choice is not None:
+        for paper_id in topics[choice]["exemplars"]:
+            st.markdown(f"<div class='chat-history-item'>📄 {papers[paper_id]['title'][:80]}</div>",
+                        unsafe_allow_html=True)
+
+    st.toggle("⚡ Cluster-pruned search", key="cluster_pruned",
+              help="Score only the topics closest to each query instead of the whole corpus.")
+    measured = clusters.meta.get("eval")
+    if measured:
+        st.caption(
+            f"{measured['n_probe']} closest topics: recall@{measured['top_k']} "
+            f"{measured['recall']:.0%} of a full scan, {measured['pruned_ms']:.1f} vs "
+            f"{measured['full_ms']:.1f} ms per query"
+        )
+
+
+def render_sidebar(papers: list, store, owner: str, warmup):
     with st.sidebar:
         st.markdown("""
         <div style='display:flex;align-items:center;gap:10px;margin-bottom:20px;'>
@@ -268,33 +362,46 @@ def render_sidebar(papers: list):
         """, unsafe_allow_html=True)
 
         if st.button("✏️  New Chat", use_container_width=True):
-            st.session_state.messages = []
-            st.session_state.last_research_topic = ""
-            st.session_state.last_research_content = ""
+            _reset_conversation([], None)
             st.rerun()
 
+        # ── Paginated session list; a conversation is only loaded when clicked ──
         st.markdown("<div class='sidebar-title'>Recent Chats</div>", unsafe_allow_html=True)
-        for chat in st.session_state.chat_history[:8]:
-            st.markdown(f"<div class='chat-history-item'>💬 {chat}</div>", unsafe_allow_html=True)
+        page = st.session_state.sidebar_page
+        total = store.count_sessions(owner)
+        for session_id, title in store.list_sessions(owner, page, SIDEBAR_PAGE_SIZE):
+            is_current = session_id == st.session_state.session_id
+            if st.button(f"💬 {title}", key=f"session_{session_id}", use_container_width=True,
+                         type="primary" if is_current else "secondary",
+                         disabled=not warmup.ready):
+                if not is_current:
+                    _reset_conversation(store.load_messages(owner, session_id, papers), session_id)
+                    st.rerun()
+        if not total:
+            st.markdown("<div class='chat-history-item'>💬 Welcome Chat</div>", unsafe_allow_html=True)
+
+        if total > SIDEBAR_PAGE_SIZE:
+            prev_col, next_col = st.columns(2)
+            with prev_col:
+                if st.button("◀ Newer", key="sessions_prev", use_container_width=True,
+                             disabled=page == 0):
+                    st.session_state.sidebar_page -= 1
+                    st.rerun()
+            with next_col:
+                if st.button("Older ▶", key="sessions_next", use_container_width=True,
+                             disabled=(page + 1) * SIDEBAR_PAGE_SIZE >= total):
+                    st.session_state.sidebar_page += 1
+                    st.rerun()
 
         st.divider()
         st.markdown("<div class='sidebar-title'>Dataset Status</div>", unsafe_allow_html=True)
-        if papers:
-            st.markdown(f"""
-            <div style='font-size:12px;color:#9aa0a6;line-height:1.9;'>
-                <span style='color:#34a853;font-weight:600;'>✅ Loaded</span><br>
-                📄 <b style='color:#bdc1c6;'>Papers:</b> {len(papers):,}<br>
-                🗂️ <b style='color:#bdc1c6;'>Source:</b> ArXiv CSV<br>
-                🔍 <b style='color:#bdc1c6;'>Search:</b> Keyword + Context
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown("""
-            <div style='font-size:12px;color:#9aa0a6;line-height:1.9;'>
-                <span style='color:#ea4335;font-weight:600;'>⚠️ Not Found</span><br>
-                Place <code>arxiv_data.csv</code> next to <code>app.py</code>
-            </div>
-            """, unsafe_allow_html=True)
+        # Poll only while something is still warming up
+        warming = not warmup.ready or not (warmup.model_ready or warmup.model_error)
+        st.fragment(run_every=1.0 if warming else None)(_render_readiness)(warmup)
+
+        if warmup.ready and warmup.index.clusters is not None:
+            st.divider()
+            _render_topic_map(warmup.index.clusters, papers)
 
         st.divider()
         st.markdown("<div class='sidebar-title'>Project Info</div>", unsafe_allow_html=True)
@@ -339,7 +446,18 @@ def render_topbar():
 # ══════════════════════════════════════════════════════════════════════════════
 # 4. WELCOME SCREEN
 # ══════════════════════════════════════════════════════════════════════════════
-def render_welcome(papers: list):
+SUGGESTIONS = [
+    ("🧠", "What is a multi-agent LLM system?"),
+    ("📄", "Generate a PDF on RAG architecture"),
+    ("🔬", "Survey on transformer attention"),
+    ("💬", "How are you today?"),
+    ("📊", "Compare GPT-4 vs LLaMA"),
+    ("🖼️", "Find papers on computer vision"),
+]
+
+
+def render_welcome(papers: list) -> str | None:
+    """Welcome screen; returns the suggestion chip the user clicked, if any."""
     paper_count = f"{len(papers):,}" if papers else "0"
     st.markdown(f"""
     <div class='welcome-wrap'>
@@ -348,72 +466,156 @@ def render_welcome(papers: list):
             Powered by <b>{paper_count} ArXiv papers</b>. Ask research questions and get answers
             grounded in real academic literature — plus PDF export.
         </div>
-        <div class='suggestion-chips'>
-            <div class='chip'>🧠 What is a multi-agent LLM system?</div>
-            <div class='chip'>📄 Generate a PDF on RAG architecture</div>
-            <div class='chip'>🔬 Survey on transformer attention</div>
-            <div class='chip'>💬 How are you today?</div>
-            <div class='chip'>📊 Compare GPT-4 vs LLaMA</div>
-            <div class='chip'>🖼️ Find papers on computer vision</div>
-        </div>
     </div>
     """, unsafe_allow_html=True)
 
+    clicked = None
+    cols = st.columns(3)
+    for idx, (icon, text) in enumerate(SUGGESTIONS):
+        with cols[idx % 3]:
+            if st.button(f"{icon} {text}", key=f"suggest_{idx}", use_container_width=True):
+                clicked = text
+    return clicked
+
 
 # ══════════════════════════════════════════════════════════════════════════════
 # 5. CHAT MESSAGES
 # ══════════════════════════════════════════════════════════════════════════════
-def render_messages(papers: list):
-    for i, msg in enumerate(st.session_state.messages):
+MESSAGE_WINDOW = 20   # messages shown per "load earlier" step
+
+
+def _message_badges_html(msg: dict) -> str:
+    html = ""
+    if msg.get("research", False):
+        html += "<span class='research-badge'>🔬 RESEARCH REPORT</span> "
+    retrieved_papers = msg.get("retrieved_papers", [])
+    if retrieved_papers:
+        html += (
+            f"<span class='dataset-badge'>📚 {len(retrieved_papers)} ArXiv Papers Retrieved</span>"
+        )
+    return html
+
+
+def _paper_cards_html(retrieved_papers: list) -> str:
+    cards = []
+    for p in retrieved_papers:
+        terms = parse_terms(p["terms"])
+        tags_html = "".join(f"<span class='paper-tag'>{t}</span>" for t in terms[:4])
+        summary_preview = p['summary'][:280].replace('\n', ' ')
+        cards.append(f"""
+        <div class='paper-card'>
+            <div class='paper-title'>📄 {p['title']}</div>
+            <div class='paper-summary'>{summary_preview}...</div>
+            <div class='paper-tags'>{tags_html}</div>
+        </div>
+        """)
+    return "".join(cards)
+
+
+def _cached_html(msg_key: str, part: str, build) -> str:
+    """Render-cache lookup keyed by message ID; messages are immutable once stored."""
+    entry = st.session_state.render_cache.setdefault(msg_key, {})
+    if part not in entry:
+        entry[part] = build()
+    return entry[part]
+
+
+def _render_related(msg_key: str, retrieved_papers: list, papers: list, related):
+    """"More like this": precomputed neighbours of one retrieved paper, no new search."""
+    choice = st.selectbox(
+        "🔗 More like this", range(len(retrieved_papers)), index=None,
+        format_func=lambda j: retrieved_papers[j]["title"][:90],
+        placeholder="Show papers related to…", key=f"related_{msg_key}",
+    )
+    if choice is None:
+        return
+    paper_id = retrieved_papers[choice]["id"]
+    st.markdown(
+        _cached_html(msg_key, f"related_{paper_id}", lambda: _paper_cards_html(
+            [papers[nid] for nid, _ in related.neighbours(paper_id, 5)]
+        )),
+        unsafe_allow_html=True
+    )
+
+
+def render_messages(papers: list, related=None):
+    messages = st.session_state.messages
+    if not messages:
+        return
+
+    # ── Only the latest window is rendered; older turns stay behind "load earlier" ──
+    start = max(0, len(messages) - st.session_state.message_window)
+    if start:
+        if st.button(f"⬆️ Load earlier messages ({start} hidden)", key="load_earlier",
+                     use_container_width=True):
+            st.session_state.message_window += MESSAGE_WINDOW
+            st.rerun()
+
+    last = len(messages) - 1
+    for i in range(start, len(messages)):
+        msg = messages[i]
+        msg_key = msg.get("id") or f"idx{i}"
         role = msg["role"]
-        content = msg["content"]
-        is_research = msg.get("research", False)
         retrieved_papers = msg.get("retrieved_papers", [])
         avatar = "🧑" if role == "user" else "🔬"
 
         with st.chat_message(role, avatar=avatar):
-            if is_research and role == "assistant":
-                st.markdown("<span class='research-badge'>🔬 RESEARCH REPORT</span>", unsafe_allow_html=True)
-            if retrieved_papers and role == "assistant":
-                count = len(retrieved_papers)
-                st.markdown(
-                    f"<span class='dataset-badge'>📚 {count} ArXiv Papers Retrieved</span>",
-                    unsafe_allow_html=True
+            if role == "assistant":
+                badges = _cached_html(msg_key, "badges", lambda: _message_badges_html(msg))
+                if badges:
+                    st.markdown(badges, unsafe_allow_html=True)
+
+            st.markdown(msg["content"])
+
+            stats = msg.get("stats")
+            if stats:
+                st.caption(
+                    f"⚡ prefill {stats['prompt_tokens']:,} tok · {stats['prefill_ms']:,.0f} ms"
+                    f" · {stats['output_tokens']:,} tok out · {stats['wall_ms'] / 1000:.1f} s total"
+                    + (" · prefetched" if stats.get("prefetched") else "")
                 )
 
-            st.markdown(content)
-
+            # ── Heavy payloads render on demand; only the newest PDF is sent eagerly ──
             if retrieved_papers and role == "assistant":
-                with st.expander(f"📚 View {len(retrieved_papers)} Retrieved ArXiv Papers"):
-                    for p in retrieved_papers:
-                        terms = parse_terms(p["terms"])
-                        tags_html = "".join(f"<span class='paper-tag'>{t}</span>" for t in terms[:4])
-                        summary_preview = p['summary'][:280].replace('\n', ' ')
-                        st.markdown(f"""
-                        <div class='paper-card'>
-                            <div class='paper-title'>📄 {p['title']}</div>
-                            <div class='paper-summary'>{summary_preview}...</div>
-                            <div class='paper-tags'>{tags_html}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                if st.toggle(f"📚 View {len(retrieved_papers)} Retrieved ArXiv Papers",
+                             key=f"papers_{msg_key}"):
+                    st.markdown(
+                        _cached_html(msg_key, "cards", lambda: _paper_cards_html(retrieved_papers)),
+                        unsafe_allow_html=True
+                    )
+                    if related is not None:
+                        _render_related(msg_key, retrieved_papers, papers, related)
 
             if msg.get("image_url"):
                 st.image(msg["image_url"], width=480)
 
-            if msg.get("pdf_bytes"):
-                st.download_button(
-                    label="📥 Download Research PDF",
-                    data=msg["pdf_bytes"],
-                    file_name=f"research_{msg.get('pdf_topic','report').replace(' ','_')[:40]}.pdf",
-                    mime="application/pdf",
-                    key=f"dl_{i}"
-                )
+            if msg.get("pdf_path"):
+                if i == last or st.toggle("📥 Show PDF download", key=f"pdf_{msg_key}"):
+                    with open(msg["pdf_path"], "rb") as f:
+                        pdf_bytes = f.read()
+                    st.download_button(
+                        label="📥 Download Research PDF",
+                        data=pdf_bytes,
+                        file_name=f"research_{msg.get('pdf_topic','report').replace(' ','_')[:40]}.pdf",
+                        mime="application/pdf",
+                        key=f"dl_{msg_key}"
+                    )
+
+
+def render_filtered_papers(query: str, category: str, found: list):
+    """The last search re-ranked within the category chip picked after it was answered."""
+    st.markdown(f"<div class='sidebar-title'>📂 {html.escape(category)} papers for "
+                f"“{html.escape(query)}”</div>", unsafe_allow_html=True)
+    if found:
+        st.markdown(_paper_cards_html(found), unsafe_allow_html=True)
+    else:
+        st.caption(f"No papers in {category} match this query.")
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 # 6. INPUT PANEL  (returns user_input string or None)
 # ══════════════════════════════════════════════════════════════════════════════
-def render_input_panel(papers: list, categories: list) -> str | None:
+def render_input_panel(papers: list, categories: list, facets: dict = None) -> str | None:
 
     st.markdown("<div style='height: 120px;'></div>", unsafe_allow_html=True)
 
@@ -431,6 +633,8 @@ def render_input_panel(papers: list, categories: list) -> str | None:
             with cols[idx]:
                 is_active = st.session_state.selected_category == cat
                 label = f"{'✦ ' if is_active else ''}{cat}"
+                if facets:
+                    label += f" · {facets.get(cat, 0):,}"
                 if st.button(label, key=f"cat_{cat}", use_container_width=True,
                              type="primary" if is_active else "secondary"):
                     st.session_state.selected_category = cat